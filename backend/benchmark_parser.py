@@ -0,0 +1,228 @@
+"""
+Parser benchmark: generates synthetic API catalogues and times every reader mode.
+
+Usage (from the backend directory):
+    python benchmark_parser.py --rows 1000 10000 --payload-bytes 200 2000 --output bench.json
+
+The sheets / sheets-parallel modes parse a workbook with the same rows spread over
+--sheets API sheets with all_sheets=True, inline and on the process pool. The
+-parallel modes size the pool by CPU count, so on a single CPU they run inline too.
+
+Each (workbook, mode) case runs in a fresh subprocess so peak RSS is per case.
+Results are printed (and optionally written) as JSON so runs can be compared
+across commits.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+HEADER_VARIANTS = {
+    # Exactly the template headers
+    "canonical": [
+        "Ref ID", "Module/Feature", "API Name", "HTTP Method", "Endpoint URL",
+        "Headers Required", "Request Payload (JSON example)", "URL Params",
+        "Expected Response (Success)", "Token Variable", "Is Token Generator", "Auth Scope"
+    ],
+    # Headers as users tend to type them: different case, padding, line breaks, shortened
+    "fuzzy": [
+        " ref id", "MODULE/FEATURE", "API Name ", "HTTP\nMethod", "Endpoint URL",
+        "Headers", "Request Payload", "URL Params", "Expected Response",
+        "token variable", "Is Token Generator?", "auth scope"
+    ],
+}
+
+# Reader modes: name -> (file extension, parse_file keyword arguments)
+MODES = {
+    "pandas": (".xlsx", {"mode": "pandas", "workers": 1}),
+    "pandas-parallel": (".xlsx", {"mode": "pandas"}),
+    "stream": (".xlsx", {"mode": "stream"}),
+    "csv": (".csv", {}),
+    "jsonl": (".jsonl", {}),
+    "sheets": (".xlsx", {"mode": "pandas", "workers": 1, "all_sheets": True}),
+    "sheets-parallel": (".xlsx", {"mode": "pandas", "all_sheets": True}),
+}
+
+def synthetic_rows(rows: int, payload_bytes: int, seed: int = 42):
+    """Yields API rows (lists in canonical column order) with payloads of about payload_bytes."""
+    rnd = random.Random(seed)
+    methods = ["GET", "POST", "PUT", "DELETE", "PATCH"]
+    for i in range(rows):
+        method = methods[i % len(methods)]
+        payload = {"id": i, "tenantId": "bench-tenant"}
+        filler = 0
+        while len(json.dumps(payload)) < payload_bytes:
+            payload[f"field_{filler}"] = "".join(rnd.choice("abcdefghijklmnop") for _ in range(24))
+            filler += 1
+        absolute = i % 7 == 0
+        yield [
+            f"BENCH-{i:06d}",
+            f"Module {i % 25}",
+            f"Bench API {i}",
+            method,
+            f"https://api.bench.example.com/v1/resource/{i}" if absolute else f"/resource/{i}",
+            "Content-Type: application/json; token: {{authToken}}",
+            json.dumps(payload) if method != "GET" else "",
+            json.dumps({"customerId": str(20000 + i), "page": "1"}),
+            json.dumps({"id": i, "status": "ok"}),
+            "authToken" if i == 0 else "",
+            "TRUE" if i == 0 else "FALSE",
+            "collection" if i % 3 == 0 else "",
+        ]
+
+def write_catalogue(path: str, ext: str, rows: int, payload_bytes: int, header_variant: str, env_rows: int,
+                    sheets: int = 1):
+    """Writes a catalogue; with sheets > 1 (.xlsx only) the rows are dealt round-robin over that many API sheets."""
+    header = HEADER_VARIANTS[header_variant]
+    if ext == ".xlsx":
+        import openpyxl
+
+        wb = openpyxl.Workbook(write_only=True)
+        api_sheets = [wb.create_sheet("apis" if sheets == 1 else f"module_{i}") for i in range(sheets)]
+        for ws in api_sheets:
+            ws.append(header)
+        for i, row in enumerate(synthetic_rows(rows, payload_bytes)):
+            api_sheets[i % sheets].append(row)
+        env = wb.create_sheet("environments")
+        env.append(["Variable", "Value"])
+        env.append(["base_url", "https://api.bench.example.com"])
+        for i in range(env_rows):
+            env.append([f"var_{i}", f"value_{i}"])
+        wb.save(path)
+    elif ext == ".csv":
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(synthetic_rows(rows, payload_bytes))
+    elif ext == ".jsonl":
+        with open(path, "w", encoding="utf-8") as f:
+            for row in synthetic_rows(rows, payload_bytes):
+                f.write(json.dumps(dict(zip(header, row))) + "\n")
+    else:
+        raise ValueError(f"Unsupported extension {ext}")
+
+def run_case(path: str, mode: str, trace_memory: bool) -> dict:
+    """Parses `path` once with the given mode and reports timings (runs inside the case subprocess)."""
+    import contextlib
+    from services import parser
+
+    ext, kwargs = MODES[mode]
+    with open(path, "rb") as f:
+        content = f.read()
+
+    # Keep one-off import cost out of the timed run (the server pays it once)
+    if ext == ".xlsx":
+        import openpyxl  # noqa: F401
+        if kwargs.get("mode") == "pandas":
+            import pandas  # noqa: F401
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        api_data, warnings = parser.parse_file(content, path, **kwargs)
+        wall = time.perf_counter() - start
+
+        traced_peak = None
+        if trace_memory:
+            # Separate pass: tracemalloc slows parsing down too much to share the timed run
+            del api_data
+            tracemalloc.start()
+            api_data, warnings = parser.parse_file(content, path, **kwargs)
+            traced_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    apis = len(api_data["apis"]) if api_data else 0
+    return {
+        "wall_s": round(wall, 4),
+        "rows_per_s": round(apis / wall, 1) if wall else None,
+        "peak_rss_mb": _peak_rss_mb(),
+        "tracemalloc_peak_mb": round(traced_peak / 2**20, 2) if traced_peak is not None else None,
+        "apis": apis,
+        "warnings": len(warnings),
+    }
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 2)
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except Exception:
+        return None
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    ap.add_argument("--payload-bytes", type=int, nargs="+", default=[200])
+    ap.add_argument("--header-variants", nargs="+", default=["canonical"], choices=list(HEADER_VARIANTS))
+    ap.add_argument("--env-rows", type=int, nargs="+", default=[10])
+    ap.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    ap.add_argument("--sheets", type=int, default=4, help="API sheets of the workbook the sheets modes parse")
+    ap.add_argument("--no-tracemalloc", action="store_true", help="skip the tracemalloc pass")
+    ap.add_argument("--workdir", default="bench_workbooks", help="where synthetic files are written (and reused)")
+    ap.add_argument("--output", help="also write the JSON report to this file")
+    ap.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.run_case:
+        case = json.loads(args.run_case)
+        print(json.dumps(run_case(case["path"], case["mode"], case["trace_memory"])))
+        return
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = []
+    for rows in args.rows:
+        for payload_bytes in args.payload_bytes:
+            for header_variant in args.header_variants:
+                for env_rows in args.env_rows:
+                    params = {"rows": rows, "payload_bytes": payload_bytes,
+                              "header_variant": header_variant, "env_rows": env_rows}
+                    for mode in args.modes:
+                        ext, kwargs = MODES[mode]
+                        sheets = args.sheets if kwargs.get("all_sheets") else 1
+                        suffix = f"_{sheets}sheets" if sheets > 1 else ""
+                        path = os.path.join(args.workdir,
+                                            f"bench_{rows}_{payload_bytes}_{header_variant}_{env_rows}{suffix}{ext}")
+                        if not os.path.exists(path):
+                            print(f"Generating {path}...", file=sys.stderr)
+                            write_catalogue(path, ext, rows, payload_bytes, header_variant, env_rows, sheets)
+                        case = {"path": path, "mode": mode, "trace_memory": not args.no_tracemalloc}
+                        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-case", json.dumps(case)],
+                                              capture_output=True, text=True)
+                        if proc.returncode != 0:
+                            result = {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+                        else:
+                            result = json.loads(proc.stdout.strip().splitlines()[-1])
+                        results.append({**params, "mode": mode, "sheets": sheets, "file_bytes": os.path.getsize(path),
+                                        **result})
+                        print(f"{mode:<16} rows={rows:<7} payload={payload_bytes:<6} {result}", file=sys.stderr)
+
+    report = {
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Pytest generator benchmark: times generate_pytest_project on a synthetic catalogue.
+
+Usage (from the backend directory):
+    python benchmark_pytest_generator.py --rows 5000 --compresslevels 1 6 9 --output bench.json
+
+The catalogue is parsed once; each (compresslevel, extract) case then generates the
+project --repeat times into a scratch directory. Results are printed (and optionally
+written) as JSON so runs can be compared across commits.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_parser import write_catalogue, _git_commit
+
+def run_case(api_data: dict, compresslevel: int, extract: bool, repeat: int) -> dict:
+    from services import pytest_generator
+
+    times = []
+    for _ in range(repeat):
+        out_dir = tempfile.mkdtemp(prefix="bench_pytest_")
+        try:
+            start = time.perf_counter()
+            zip_path = pytest_generator.generate_pytest_project(api_data, out_dir, extract=extract,
+                                                                compresslevel=compresslevel)
+            times.append(time.perf_counter() - start)
+            zip_bytes = os.path.getsize(zip_path)
+            files_on_disk = sum(len(files) for _, _, files in os.walk(out_dir))
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+    median = statistics.median(times)
+    apis = len(api_data["apis"])
+    return {
+        "median_s": round(median, 4),
+        "min_s": round(min(times), 4),
+        "apis_per_s": round(apis / median, 1) if median else None,
+        "zip_bytes": zip_bytes,
+        "files_on_disk": files_on_disk,
+        "apis": apis,
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, nargs="+", default=[5000])
+    ap.add_argument("--payload-bytes", type=int, default=200)
+    ap.add_argument("--compresslevels", type=int, nargs="+", default=[6])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--workdir", default="bench_workbooks", help="where synthetic files are written (and reused)")
+    ap.add_argument("--output", help="also write the JSON report to this file")
+    args = ap.parse_args()
+
+    from services import parser, postman_generator
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = []
+    for rows in args.rows:
+        path = os.path.join(args.workdir, f"bench_{rows}_{args.payload_bytes}_canonical_10.xlsx")
+        if not os.path.exists(path):
+            print(f"Generating {path}...", file=sys.stderr)
+            write_catalogue(path, ".xlsx", rows, args.payload_bytes, "canonical", 10)
+        with contextlib.redirect_stdout(io.StringIO()):
+            api_data, _ = parser.parse_file(path, os.path.basename(path))
+        # Rows as the server hands them to the pytest build (see routers/processing.py)
+        postman_generator.apply_default_headers(api_data["apis"])
+        for compresslevel in args.compresslevels:
+            for extract in (False, True):
+                result = run_case(api_data, compresslevel, extract, args.repeat)
+                results.append({"rows": rows, "compresslevel": compresslevel, "extract": extract, **result})
+                print(f"rows={rows:<7} level={compresslevel} extract={extract!s:<5} {result}", file=sys.stderr)
+
+    report = {
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+if __name__ == "__main__":
+    main()
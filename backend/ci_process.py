@@ -18,12 +18,9 @@ def run_ci_gen(file_path="sample_api.xlsx", output_dir="ci_output"):
         else:
              sys.exit(1)
 
-    print(f"Loading {file_path}...")
-    with open(file_path, "rb") as f:
-        content = f.read()
-    
-    print("Parsing...")
-    api_data, warnings = parser.parse_xlsx(content)
+    print(f"Parsing {file_path}...")
+    # .xlsx, .csv, .tsv and .jsonl are picked by extension; the parser reads the file directly
+    api_data, warnings = parser.parse_file(file_path, file_path)
     for w in warnings:
         print(f"WARN: {w}")
         
@@ -33,7 +30,8 @@ def run_ci_gen(file_path="sample_api.xlsx", output_dir="ci_output"):
     if not out_path.exists():
         out_path.mkdir(parents=True)
         
-    pytest_generator.generate_pytest_project(api_data, str(out_path))
+    # The workflow runs the tests straight from ci_output/pytest_tests
+    pytest_generator.generate_pytest_project(api_data, str(out_path), extract=True)
     print("Done. Tests generated in ci_output/pytest_tests")
 
 if __name__ == "__main__":
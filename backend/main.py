@@ -1,21 +1,37 @@
 import os
 import sys
+import time
+import importlib
 from pathlib import Path
 
+# Startup timing report: (stage, seconds), logged from startup_event
+_PROCESS_START = time.perf_counter()
+STARTUP_TIMINGS = []
+
+def _timed_import(name):
+    """Imports a module and records how long it took (0 if it was already imported)."""
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    STARTUP_TIMINGS.append((f"import {name}", time.perf_counter() - start))
+    return module
+
 # Add the current directory (backend) to sys.path to resolve 'routers' import
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+import asyncio
 import logging
+_timed_import("fastapi")
 from fastapi import FastAPI, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from pathlib import Path
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_init_start = time.perf_counter()
 app = FastAPI(title="API Factory Backend")
 
 # 5. CORS Configuration
@@ -25,6 +41,7 @@ app.add_middleware(
     allow_credentials=False, # No cookies needed for this app
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"], # read by the status poller for If-None-Match
 )
 
 # Constants
@@ -36,24 +53,68 @@ TEMPLATE_PATH = ARTIFACTS_DIR / TEMPLATE_FILENAME
 if not ARTIFACTS_DIR.exists():
     ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
 
+STARTUP_TIMINGS.append(("init app + artifacts dir", time.perf_counter() - _init_start))
+
 # --- Integrated Existing Functionality ---
-# --- Integrated Existing Functionality ---
+# Service modules are imported one by one first so the report breaks the router import down
+for _module in ["services.parser", "services.postman_generator", "services.pytest_generator",
+                "services.artifact_cache", "services.incremental", "services.task_store", "services.retention",
+                "services.task_events", "services.job_executor", "services.metrics",
+                "routers.processing"]:
+    _timed_import(_module)
 from routers import processing
+from services import metrics
+_init_start = time.perf_counter()
 app.include_router(processing.router)
+# Outermost, so the time includes the other middleware
+app.add_middleware(metrics.HttpMetricsMiddleware, histogram=processing.HTTP_REQUEST_SECONDS)
+STARTUP_TIMINGS.append(("init include_router(processing)", time.perf_counter() - _init_start))
 logger.info("Successfully loaded 'processing' router.")
 
 # 7. Health Check
 @app.on_event("startup")
 async def startup_event():
+    logger.info("Startup timing report:")
+    for stage, seconds in STARTUP_TIMINGS:
+        logger.info(f"  {stage:<45} {seconds * 1000:8.1f} ms")
+    logger.info(f"  {'total (main import -> startup event)':<45} {(time.perf_counter() - _PROCESS_START) * 1000:8.1f} ms")
+
     logger.info("Registered Routes:")
     for route in app.routes:
         methods = getattr(route, "methods", None)
-        logger.info(f"{route.path} [{methods}]")
+        # Newer FastAPI versions list included routers as entries without a path
+        logger.info(f"{getattr(route, 'path', route)} [{methods}]")
+
+    processing.get_retention_sweeper().start()
+    # Start the job worker processes now rather than on the first upload, without waiting
+    # for their imports: they warm up in the background (see "ready" in /api/jobs/stats)
+    task = asyncio.create_task(asyncio.to_thread(_start_job_executor))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+# Keeps background startup tasks referenced until they finish
+_background_tasks = set()
+
+def _start_job_executor():
+    try:
+        processing.get_job_executor().start()
+    except Exception as e:
+        # Uploads retry the start (JobExecutor.submit() calls start())
+        logger.error(f"Failed to start the job executor: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    processing.shutdown_job_executor()
 
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Metrics of this server worker in the Prometheus text format."""
+    return Response(processing.METRICS.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/")
 def read_root():
     return {"status": "running", "message": "Backend is active. Docs at /docs"}
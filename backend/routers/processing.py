@@ -1,20 +1,46 @@
-from fastapi import APIRouter, UploadFile, File, BackgroundTasks, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.requests import ClientDisconnect
+import asyncio
+import concurrent.futures
+import contextvars
+import functools
 import uuid
+import hashlib
 import os
 import shutil
 import json
+import threading
+import time
 import traceback
+import aiofiles
+from contextlib import contextmanager
 from pathlib import Path
-from services import parser, postman_generator, pytest_generator
+from services import parser, postman_generator, pytest_generator, incremental, profiling, tracing
+from services.artifact_cache import ArtifactCache, cache_hasher
+from services.blob_store import BlobStore
+from services.upload_sessions import UploadSessions, UploadBusy
+from services.task_store import TaskStore, open_task_store
+from services.retention import RetentionPolicy, RetentionSweeper
+from services.task_events import TaskEventHub, format_sse
+from services import job_executor
+from services.job_executor import JobExecutor, QueueFull
+from services.metrics import MetricsRegistry
 
 router = APIRouter(prefix="/api", tags=["processing"])
 
-# Simple in-memory storage for task state
-# Structure: { task_id: { "status": "pending"|"processing"|"completed"|"failed", "logs": [], "artifacts": {} } }
-TASKS = {}
 ARTIFACTS_DIR = Path("artifacts_storage")
-TASKS_FILE = ARTIFACTS_DIR / "tasks.json"
+# "sqlite" (default, artifacts_storage/tasks.db) or "json" (legacy artifacts_storage/tasks.json)
+TASK_STORE_KIND = os.getenv("TASK_STORE", "sqlite")
+# Uploads are streamed here in chunks and parsed straight from disk, then removed
+UPLOADS_DIR = ARTIFACTS_DIR / "uploads"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Chunk size suggested to clients of the chunked upload API (/api/uploads)
+CHUNKED_UPLOAD_CHUNK_SIZE = int(os.getenv("CHUNKED_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+# "pandas" (default) or "stream" (row-by-row openpyxl reader, constant memory)
+PARSER_MODE = os.getenv("PARSER_MODE", "pandas")
+# Process pool size for decoding JSON cells of large sheets (unset = one per CPU)
+PARSER_WORKERS = int(os.getenv("PARSER_WORKERS", "0")) or None
 
 if not ARTIFACTS_DIR.exists():
     try:
@@ -22,114 +48,508 @@ if not ARTIFACTS_DIR.exists():
     except:
         pass
 
-def load_tasks():
-    global TASKS
-    if TASKS_FILE.exists():
-        try:
-            with open(TASKS_FILE, "r") as f:
-                TASKS = json.load(f)
-        except Exception:
-            TASKS = {}
-    else:
-        TASKS = {}
-        
-def save_tasks():
-    try:
-        with open(TASKS_FILE, "w") as f:
-            json.dump(TASKS, f, indent=4)
-    except Exception as e:
-        print(f"Failed to save tasks: {e}")
+# Task state, opened on first use instead of at import time (see get_task_store)
+TASK_STORE = None
+_task_store_lock = threading.Lock()
+
+def get_task_store() -> TaskStore:
+    global TASK_STORE
+    if TASK_STORE is None:
+        with _task_store_lock:
+            if TASK_STORE is None:
+                TASK_STORE = open_task_store(TASK_STORE_KIND, ARTIFACTS_DIR)
+                TASK_STORE.add_listener(_notify_task_events)
+    return TASK_STORE
+
+# Wakes /api/tasks/{task_id}/events streams (see services/task_events.py)
+TASK_EVENT_HUB = None
+# How often each worker checks watched tasks for changes made by other workers
+TASK_EVENTS_POLL_SECONDS = float(os.getenv("TASK_EVENTS_POLL_SECONDS", "0.5"))
+# Comment line sent on idle streams so proxies keep the connection open
+TASK_EVENTS_KEEPALIVE_SECONDS = 15
+
+def get_task_event_hub() -> TaskEventHub:
+    global TASK_EVENT_HUB
+    if TASK_EVENT_HUB is None:
+        TASK_EVENT_HUB = TaskEventHub(get_task_store, poll_interval=TASK_EVENTS_POLL_SECONDS)
+    return TASK_EVENT_HUB
+
+def _notify_task_events(task_id: str):
+    # In a job worker process the change is relayed to the server process's hub
+    if job_executor.notify_parent(task_id):
+        return
+    if TASK_EVENT_HUB is not None:
+        TASK_EVENT_HUB.notify(task_id)
+
+# Uploads are processed by a bounded pool of pre-warmed worker processes (see services/job_executor.py)
+JOB_EXECUTOR = None
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "16"))
+# "process" (default) or "thread"; the json task store only works within one process
+JOB_EXECUTOR_MODE = os.getenv("JOB_EXECUTOR", "process") if TASK_STORE_KIND != "json" else "thread"
+# Upload `priority` values; queued jobs with a lower rank run first
+JOB_PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+# Statuses after which a task never changes again
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+# Running jobs re-read the cancellation flag at most this often between rows
+CANCEL_CHECK_SECONDS = 0.5
+# "process": the pytest project is built in a forked child while the job builds the Postman
+# collection, so the two do not share one GIL; "thread" builds both in the job's process.
+# Only job worker processes fork, never the (multi-threaded) server process.
+ARTIFACT_EMITTERS = (os.getenv("ARTIFACT_EMITTERS", "process")
+                     if JOB_EXECUTOR_MODE == "process" and job_executor.fork_available() else "thread")
+# zlib level of the pytest project zip (1 fastest ... 9 smallest)
+ZIP_COMPRESSION_LEVEL = int(os.getenv("ZIP_COMPRESSION_LEVEL", str(pytest_generator.DEFAULT_COMPRESSLEVEL)))
+# "zip" keeps pytest_tests.zip with the task; "blobs" stores the project files in the shared
+# blob store (each distinct file once) and zips them on the fly for each download
+PYTEST_ARTIFACT_STORAGE = os.getenv("PYTEST_ARTIFACT_STORAGE", "zip")
+
+def get_job_executor() -> JobExecutor:
+    global JOB_EXECUTOR
+    if JOB_EXECUTOR is None:
+        JOB_EXECUTOR = JobExecutor(
+            JOB_WORKERS, JOB_QUEUE_SIZE, mode=JOB_EXECUTOR_MODE,
+            warm_modules=["pandas", "openpyxl", "routers.processing"],
+            on_notify=_notify_task_events
+        )
+    return JOB_EXECUTOR
+
+def shutdown_job_executor():
+    if JOB_EXECUTOR is not None:
+        JOB_EXECUTOR.shutdown()
+
+def _job_done(task_id: str, error, result, queued_at: float):
+    """
+    Records the job's metrics (`result` is what process_file_task returned). Marks the
+    task failed if its job never got to report (e.g. the worker process died).
+    """
+    store = get_task_store()
+    status = store.get_status(task_id)
+    if error is not None and status in ("pending", "processing"):
+        store.append_log(task_id, f"ERROR: Processing job failed: {error!r}")
+        store.set_status(task_id, "failed")
+        status = "failed"
+    JOB_SECONDS.observe(time.monotonic() - queued_at)
+    if status is not None:
+        TASKS_TOTAL.inc(status=status)
+    if result:
+        for stage, seconds in result["stage_seconds"].items():
+            STAGE_SECONDS.observe(seconds, stage=stage)
+        for generator, counts in result["row_cache"].items():
+            for outcome, rows in counts.items():
+                ROW_CACHE_ROWS_TOTAL.inc(rows, generator=generator, result=outcome)
+
+# Trace spans of each task, one JSONL file per task id (see services/tracing.py); TRACING=0 disables
+TRACE_EXPORTER = tracing.JsonlExporter(ARTIFACTS_DIR / "traces") if os.getenv("TRACING", "1") != "0" else None
+
+# Repeated uploads of the same workbook reuse the artifacts of the first run
+ARTIFACT_CACHE = None
+
+def get_artifact_cache() -> ArtifactCache:
+    global ARTIFACT_CACHE
+    if ARTIFACT_CACHE is None:
+        ARTIFACT_CACHE = ArtifactCache(
+            ARTIFACTS_DIR / "cache_index.json",
+            max_entries=int(os.getenv("ARTIFACT_CACHE_MAX_ENTRIES", "64"))
+        )
+    return ARTIFACT_CACHE
+
+# Chunked, resumable uploads in progress (see services/upload_sessions.py)
+UPLOAD_SESSIONS = UploadSessions(UPLOADS_DIR)
+
+def get_upload_sessions() -> UploadSessions:
+    return UPLOAD_SESSIONS
+
+# Generated files shared by all tasks, stored once per distinct content (see services/blob_store.py)
+BLOB_STORE = None
+_blob_store_lock = threading.Lock()
+
+def get_blob_store() -> BlobStore:
+    global BLOB_STORE
+    if BLOB_STORE is None:
+        with _blob_store_lock:
+            if BLOB_STORE is None:
+                BLOB_STORE = BlobStore(ARTIFACTS_DIR / "blobs")
+    return BLOB_STORE
+
+# Background sweeper removing old task directories (see services/retention.py); 0 disables a limit
+RETENTION_SWEEPER = None
+
+def get_retention_sweeper() -> RetentionSweeper:
+    global RETENTION_SWEEPER
+    if RETENTION_SWEEPER is None:
+        policy = RetentionPolicy(
+            ttl_seconds=float(os.getenv("RETENTION_TTL_HOURS", "168")) * 3600,
+            max_bytes=int(os.getenv("RETENTION_MAX_BYTES", str(2 * 1024 * 1024 * 1024))),
+            max_tasks=int(os.getenv("RETENTION_MAX_TASKS", "1000"))
+        )
+        RETENTION_SWEEPER = RetentionSweeper(
+            get_task_store, ARTIFACTS_DIR, policy,
+            interval=float(os.getenv("RETENTION_SWEEP_INTERVAL_SECONDS", "600")),
+            cache_factory=get_artifact_cache,
+            blobs_factory=get_blob_store
+        )
+    return RETENTION_SWEEPER
+
+# Metrics of this server worker, served at /metrics (see services/metrics.py). Stage timings
+# and row reuse are measured in the job and reported back with its result (see _job_done).
+METRICS = MetricsRegistry()
+UPLOAD_SIZE_BYTES = METRICS.histogram(
+    "apifactory_upload_size_bytes", "Size of the uploaded workbooks that were queued or served from cache.",
+    buckets=[4 ** i * 1024 for i in range(2, 11)] # 16 KiB ... 256 MiB
+)
+STAGE_SECONDS = METRICS.histogram(
+    "apifactory_stage_duration_seconds",
+    "Duration of completed pipeline stages: parse, postman, pytest (including zip) and zip.",
+    labelnames=("stage",)
+)
+JOB_SECONDS = METRICS.histogram(
+    "apifactory_job_duration_seconds", "Time from queueing a task's job to the task's final status."
+)
+TASKS_TOTAL = METRICS.counter(
+    "apifactory_tasks_total", "Tasks that reached a final status (cache hits count as completed).",
+    labelnames=("status",)
+)
+ROW_CACHE_ROWS_TOTAL = METRICS.counter(
+    "apifactory_row_cache_rows_total", "Rows of incremental builds, reused from the parent task or regenerated.",
+    labelnames=("generator", "result")
+)
+HTTP_REQUEST_SECONDS = METRICS.histogram(
+    "apifactory_http_request_duration_seconds", "HTTP request duration until the response was sent.",
+    labelnames=("method", "route", "status")
+)
+
+def _job_queue_metrics(key: str):
+    return lambda: get_job_executor().stats()[key]
+
+def _artifact_cache_hit_ratio():
+    cache = get_artifact_cache()
+    lookups = cache.hits + cache.misses
+    return cache.hits / lookups if lookups else 0.0
+
+def _row_cache_hit_ratios():
+    ratios = {}
+    for generator in ("postman", "pytest"):
+        reused = ROW_CACHE_ROWS_TOTAL.value(generator=generator, result="reused")
+        rows = reused + ROW_CACHE_ROWS_TOTAL.value(generator=generator, result="regenerated")
+        ratios[(generator,)] = reused / rows if rows else 0.0
+    return ratios
 
-# Load tasks on startup
-load_tasks()
+METRICS.gauge("apifactory_job_queue_depth", "Jobs waiting for a job worker.",
+              function=_job_queue_metrics("queue_depth"))
+METRICS.gauge("apifactory_jobs_running", "Jobs running on a job worker.", function=_job_queue_metrics("running"))
+METRICS.counter("apifactory_artifact_cache_lookups_total", "Artifact cache lookups by uploads.",
+                labelnames=("result",),
+                function=lambda: {("hit",): get_artifact_cache().hits, ("miss",): get_artifact_cache().misses})
+METRICS.gauge("apifactory_artifact_cache_hit_ratio", "Share of uploads served from the artifact cache.",
+              function=_artifact_cache_hit_ratio)
+METRICS.gauge("apifactory_row_cache_hit_ratio", "Share of incremental build rows reused from the parent task.",
+              labelnames=("generator",), function=_row_cache_hit_ratios)
 
-def process_file_task(task_id: str, file_content: bytes, filename: str):
-    TASKS[task_id]["status"] = "processing"
-    TASKS[task_id]["logs"].append("Started processing file...")
-    save_tasks()
+class TaskCancelled(Exception):
+    """Raised inside a job when DELETE /api/tasks/{task_id} asked it to stop."""
+
+class _EmitterStopped(Exception):
+    """Raised in an artifact emitter because the other one failed or was cancelled."""
+
+def _cancel_checker(store: TaskStore, task_id: str):
+    """
+    Returns check(force=False), which raises TaskCancelled once the task is flagged.
+    Called per row, so the flag is only re-read every CANCEL_CHECK_SECONDS unless forced
+    (at stage boundaries).
+    """
+    last_check = 0.0
+
+    def check(force: bool = False):
+        nonlocal last_check
+        now = time.monotonic()
+        if not force and now - last_check < CANCEL_CHECK_SECONDS:
+            return
+        last_check = now
+        if store.is_cancel_requested(task_id):
+            raise TaskCancelled()
+    return check
+
+def process_file_task(task_id: str, file_path: str, filename: str, content_key: str = None, parent_task_id: str = None,
+                      all_sheets: bool = False, profile: bool = False, trace_parent: tracing.SpanContext = None):
+    """
+    The job of a queued upload. Returns the metrics _job_done records: the seconds of
+    each stage that completed ({"parse": s, "postman": s, ...}) and, for incremental
+    builds, the rows each generator reused or regenerated.
+    With profile=True the stages run under cProfile and a completed task gets a
+    "profile" artifact (see services/profiling.py). All the work then stays in the job
+    process (no parser pool, no forked pytest build), so the profile sees all of it.
+    The job is traced below trace_parent (the span that queued it).
+    """
+    store = get_task_store()
+    check_cancelled = _cancel_checker(store, task_id)
+    task_dir = ARTIFACTS_DIR / task_id
+    stage_seconds = {}
+    row_cache = None
+    profiler = profiling.TaskProfiler() if profile else None
+    job_span = tracing.start_span("process_file_task", parent=trace_parent, filename=filename, profile=profile)
 
     try:
+        # Cancelled while queued on another server worker
+        check_cancelled(force=True)
+        store.set_status(task_id, "processing")
+        store.append_log(task_id, "Started processing file...")
+        if profiler is not None:
+            store.append_log(task_id, "Profiling enabled; processing will be slower than usual.")
+
         # Step 1: Parse
-        TASKS[task_id]["logs"].append("Parsing XLSX file...")
-        api_data, warnings = parser.parse_xlsx(file_content)
+        file_format = os.path.splitext(filename)[1].lstrip(".").upper()
+        store.set_stage(task_id, "parsing")
+        store.append_log(task_id, f"Parsing {file_format} file...")
+        with _timed(stage_seconds, "parse"):
+            api_data, warnings = _run_stage(profiler, "parse", parser.parse_file, file_path, filename, mode=PARSER_MODE,
+                                            workers=1 if profiler else PARSER_WORKERS, all_sheets=all_sheets)
         
         for w in warnings:
-            TASKS[task_id]["logs"].append(f"WARNING: {w}")
+            store.append_log(task_id, f"WARNING: {w}")
+        check_cancelled(force=True)
             
         # api_data is now { "apis": [], ... }
         if not api_data or not api_data.get("apis"):
-            TASKS[task_id]["status"] = "failed"
-            TASKS[task_id]["logs"].append("No valid API definitions found in file.")
-            save_tasks()
-            return
+            store.append_log(task_id, "No valid API definitions found in file.")
+            store.set_status(task_id, "failed")
+            return _job_metrics(stage_seconds, None)
 
         api_count = len(api_data["apis"])
-        TASKS[task_id]["logs"].append(f"Found {api_count} API definitions.")
-        TASKS[task_id]["api_preview"] = api_data["apis"]
-        save_tasks()
+        store.append_log(task_id, f"Found {api_count} API definitions.")
+        store.set_preview(task_id, api_data["apis"])
 
         # Prepare specific artifact directory
-        task_dir = ARTIFACTS_DIR / task_id
         task_dir.mkdir(exist_ok=True)
 
-        # Step 2: Generate Postman Collection
-        TASKS[task_id]["logs"].append("Generating Postman Collection...")
-        collection = postman_generator.generate_postman_collection(api_data, collection_name=f"Generated from {filename}")
-        postman_path = task_dir / "postman_collection.json"
-        with open(postman_path, "w") as f:
-            json.dump(collection, f, indent=4)
-        TASKS[task_id]["artifacts"]["postman"] = str(postman_path)
+        # Incremental mode: rows unchanged since the parent task reuse its generated output
+        parent_rows, parent_artifacts = None, None
+        if parent_task_id:
+            parent_rows, parent_artifacts = _load_parent_rows(parent_task_id)
+            if parent_rows is None:
+                store.append_log(task_id, f"WARNING: Parent task {parent_task_id} has no reusable rows. Running a full build.")
+        row_cache = incremental.RowCache(api_data["apis"], parent_rows, parent_artifacts)
+
+        # Step 2: Postman collection and pytest project, built concurrently from the same rows
+        store.set_stage(task_id, "generating_artifacts")
+        _emit_artifacts(store, task_id, api_data, task_dir, filename, row_cache, check_cancelled, stage_seconds,
+                        profiler)
+        check_cancelled(force=True)
+
+        incremental.save_row_index(task_dir, row_cache)
+        if parent_rows is not None:
+            store.append_log(task_id, f"Incremental build from task {parent_task_id}: {row_cache.summary()}.")
+        if profiler is not None:
+            store.set_artifact(task_id, "profile", str(profiler.save(task_dir)))
+            store.append_log(task_id, "Profile ready.")
 
-        # Step 3: Generate Pytest Code
-        TASKS[task_id]["logs"].append("Generating Pytest structure...")
-        pytest_path = pytest_generator.generate_pytest_project(api_data, output_dir=str(task_dir))
-        TASKS[task_id]["artifacts"]["pytest"] = str(pytest_path)
+        store.append_log(task_id, "Processing finished successfully.")
+        store.set_status(task_id, "completed")
 
-        TASKS[task_id]["status"] = "completed"
-        TASKS[task_id]["logs"].append("Processing finished successfully.")
-        save_tasks()
+        if content_key:
+            get_artifact_cache().put(content_key, task_id, store.get_artifacts(task_id), warnings)
 
+    except TaskCancelled:
+        # Partial artifacts are useless, and nothing else points at a directory this new
+        shutil.rmtree(task_dir, ignore_errors=True)
+        if PYTEST_ARTIFACT_STORAGE == "blobs":
+            get_blob_store().release(task_id)
+        store.clear_artifacts(task_id)
+        store.append_log(task_id, "Cancelled by user.")
+        store.set_status(task_id, "cancelled")
     except Exception as e:
-        TASKS[task_id]["status"] = "failed"
-        TASKS[task_id]["logs"].append(f"ERROR: {str(e)}")
-        save_tasks()
+        job_span.fail(e)
+        store.append_log(task_id, f"ERROR: {str(e)}")
+        store.set_status(task_id, "failed")
         traceback.print_exc()
+    finally:
+        _remove_upload(file_path)
+        job_span.end()
+    return _job_metrics(stage_seconds, row_cache if parent_task_id else None)
+
+def _run_stage(profiler, stage: str, fn, *args, **kwargs):
+    if profiler is None:
+        return fn(*args, **kwargs)
+    return profiler.stage(stage, fn, *args, **kwargs)
+
+@contextmanager
+def _timed(stage_seconds: dict, stage: str):
+    """Records the seconds of the block in stage_seconds[stage] if it completes."""
+    start = time.perf_counter()
+    yield
+    stage_seconds[stage] = time.perf_counter() - start
+
+def _job_metrics(stage_seconds: dict, row_cache) -> dict:
+    row_counts = {}
+    if row_cache is not None:
+        row_counts = {kind: {"reused": row_cache.reused.get(kind, 0), "regenerated": row_cache.regenerated.get(kind, 0)}
+                      for kind in set(row_cache.reused) | set(row_cache.regenerated)}
+    return {"stage_seconds": stage_seconds, "row_cache": row_counts}
+
+def _emit_artifacts(store: TaskStore, task_id: str, api_data: dict, task_dir: Path, filename: str, row_cache,
+                    check_cancelled, stage_seconds: dict, profiler=None):
+    """
+    Runs the Postman and pytest emitters side by side; each publishes its artifact to
+    the task as soon as it is written, so artifacts_ready fills in one by one. If one
+    emitter fails or the task is cancelled, the other stops at its next row (a pytest
+    build in a child process is terminated). The emitters' durations are added to
+    stage_seconds, and with a profiler both run as its stages, in this process.
+    """
+    # The Postman build adds default headers to the rows in place; apply them before the
+    # pytest build starts reading, so it sees the same rows as when it ran second
+    postman_generator.apply_default_headers(api_data["apis"])
+    stop = threading.Event()
+    blob_store = get_blob_store() if PYTEST_ARTIFACT_STORAGE == "blobs" else None
+
+    def build_pytest(cancel_check=None):
+        timings = {}
+        with _timed(timings, "pytest"):
+            path = _run_stage(profiler, "pytest", pytest_generator.generate_pytest_project, api_data,
+                              output_dir=str(task_dir), row_cache=row_cache, cancel_check=cancel_check,
+                              compresslevel=ZIP_COMPRESSION_LEVEL, blob_store=blob_store, blob_owner=task_id,
+                              timings=timings)
+        return path, row_cache.export("pytest"), timings
+
+    # The child is forked before emit_pytest starts, so its spans are parented to that
+    # span through an id reserved now
+    emit_pytest_context = tracing.reserve_context()
+
+    def build_pytest_in_child():
+        with tracing.span("pytest_child", parent=emit_pytest_context):
+            return build_pytest()
+
+    # Forked before the emitter threads start, and after parsing has shut its process pool
+    # down, so this thread is the only one (see ForkedCall)
+    pytest_child = (job_executor.ForkedCall(build_pytest_in_child)
+                    if ARTIFACT_EMITTERS == "process" and profiler is None else None)
+
+    def check():
+        if stop.is_set():
+            raise _EmitterStopped()
+        check_cancelled()
+
+    @tracing.traced("emit_postman")
+    def emit_postman():
+        store.append_log(task_id, "Generating Postman Collection...")
+        postman_path = task_dir / "postman_collection.json"
+
+        def write_collection():
+            collection = postman_generator.generate_postman_collection(api_data, collection_name=f"Generated from {filename}",
+                                                                       row_cache=row_cache, cancel_check=check)
+            with tracing.span("write_artifact", kind="postman", path=str(postman_path)):
+                with open(postman_path, "w") as f:
+                    json.dump(collection, f, indent=4)
+
+        with _timed(stage_seconds, "postman"):
+            _run_stage(profiler, "postman", write_collection)
+        store.set_artifact(task_id, "postman", str(postman_path))
+        store.append_log(task_id, "Postman collection ready.")
+
+    def emit_pytest():
+        with tracing.span("emit_pytest", span_id=emit_pytest_context.span_id if emit_pytest_context else None):
+            store.append_log(task_id, "Generating Pytest structure...")
+            if pytest_child is not None:
+                pytest_path, rows, timings = pytest_child.result(check=check, poll_interval=CANCEL_CHECK_SECONDS)
+                row_cache.merge("pytest", rows)
+            else:
+                pytest_path, _, timings = build_pytest(cancel_check=check)
+            stage_seconds.update(timings)
+            store.set_artifact(task_id, "pytest", str(pytest_path))
+            store.append_log(task_id, "Pytest project ready.")
+
+    errors = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix=f"emit-{task_id[:8]}") as pool:
+        # Each emitter runs in a copy of this thread's context, so its spans nest under the job's
+        futures = [pool.submit(contextvars.copy_context().run, emit) for emit in (emit_pytest, emit_postman)]
+        for future in concurrent.futures.as_completed(futures):
+            error = future.exception()
+            if error is not None:
+                stop.set()
+                if not isinstance(error, _EmitterStopped):
+                    errors.append(error)
+    if errors:
+        raise errors[0]
+
+def _remove_upload(file_path):
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
+
+async def _save_upload(file: UploadFile, dest: Path, hasher) -> int:
+    """Streams the upload to `dest` chunk by chunk, feeding each chunk to `hasher`. Returns the byte count."""
+    size = 0
+    async with aiofiles.open(dest, "wb") as out:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            hasher.update(chunk)
+            await out.write(chunk)
+            size += len(chunk)
+    return size
+
+def _load_parent_rows(parent_task_id: str):
+    """The parent's row index and the artifacts it points into, (None, None) if it has none."""
+    store = get_task_store()
+    if store.get_status(parent_task_id) != "completed":
+        return None, None
+    # Cache hits share the directory of the task that actually generated the artifacts
+    source_id = store.get_cache_source(parent_task_id) or parent_task_id
+    rows = incremental.load_row_index(ARTIFACTS_DIR / source_id)
+    if rows is None:
+        return None, None
+    return rows, store.get_artifacts(source_id)
 
 @router.post("/upload")
 @router.post("/upload/", include_in_schema=False)
-async def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def upload_file(file: UploadFile = File(...), parent_task_id: str = Form(None),
+                      all_sheets: bool = Form(False), priority: str = Form("normal"), profile: bool = False):
+    """
+    Queues the workbook for processing. `priority` ("high", "normal" or "low") orders
+    the job queue, so e.g. interactive uploads can overtake bulk CI submissions.
+    `?profile=true` processes it under cProfile (see process_file_task), even if the
+    workbook is in the artifact cache.
+    """
     log_file = r"d:\ais\api\backend\backend_debug.log"
+    task_id = str(uuid.uuid4())
+    upload_span = tracing.start_span("upload_file", parent=tracing.new_trace(task_id, TRACE_EXPORTER),
+                                     filename=file.filename, priority=priority, profile=profile)
     try:
         with open(log_file, "a") as f:
             f.write(f"\n[UPLOAD] Starting upload for file: {file.filename}\n")
             f.write(f"[UPLOAD] CWD: {os.getcwd()}\n")
             
-        if not file.filename.endswith(".xlsx"):
-             raise HTTPException(status_code=400, detail="Invalid file format. Please upload .xlsx")
+        _validate_upload_options(file.filename, priority)
               
-        content = await file.read()
-        
+        UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+        upload_path = UPLOADS_DIR / f"{task_id}{os.path.splitext(file.filename)[1].lower()}"
+
+        # all_sheets changes the parsed output, so it is part of the cache key
+        hasher = cache_hasher(file.filename, {"all_sheets": all_sheets} if all_sheets else None)
+        try:
+            with tracing.span("save_upload") as span:
+                size = await _save_upload(file, upload_path, hasher)
+                span.set(bytes=size)
+        except Exception:
+            _remove_upload(upload_path)
+            raise
+        content_key = hasher.hexdigest()
+
         with open(log_file, "a") as f:
-            f.write(f"[UPLOAD] File read successfully. Size: {len(content)} bytes\n")
+            f.write(f"[UPLOAD] File saved to {upload_path}. Size: {size} bytes\n")
 
-        task_id = str(uuid.uuid4())
-        
-        TASKS[task_id] = {
-            "status": "pending",
-            "logs": ["File uploaded. Waiting for processing..."],
-            "artifacts": {}
-        }
-        save_tasks()
-        
-        background_tasks.add_task(process_file_task, task_id, content, file.filename)
-        
+        try:
+            result = _start_task(task_id, upload_path, file.filename, content_key, parent_task_id, all_sheets, priority,
+                                 profile)
+        except HTTPException:
+            _remove_upload(upload_path)
+            raise
         with open(log_file, "a") as f:
-            f.write(f"[UPLOAD] Task created: {task_id}\n")
-            
-        return {"task_id": task_id, "message": "Upload successful, processing started."}
-    except HTTPException:
+            f.write(f"[UPLOAD] {'Cache hit, task' if result.get('cached') else 'Task'} created: {task_id}\n")
+        return result
+    except HTTPException as e:
+        upload_span.fail(e)
         raise
     except Exception as e:
+        upload_span.fail(e)
         err_msg = traceback.format_exc()
         try:
             with open(log_file, "a") as f:
@@ -138,34 +558,415 @@ async def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File
             pass
         print(err_msg)
         raise HTTPException(status_code=500, detail=f"Upload error: {str(e)}")
+    finally:
+        upload_span.end()
+
+def _start_task(task_id: str, upload_path: Path, filename: str, content_key: str, parent_task_id: str,
+                all_sheets: bool, priority: str, profile: bool = False) -> dict:
+    """
+    Creates the task for a received upload: completed right away from the artifact
+    cache, or pending with its job queued. Raises HTTPException 429 when the queue is
+    full, leaving the upload in place. Profiled runs neither use nor fill the cache.
+    """
+    store = get_task_store()
+    UPLOAD_SIZE_BYTES.observe(upload_path.stat().st_size)
+    if profile:
+        content_key = None
+    cached = get_artifact_cache().get(content_key) if content_key else None
+    if cached:
+        source_id = cached["task_id"]
+        store.create(
+            task_id,
+            status="completed",
+            logs=["File uploaded. Waiting for processing..."]
+                 + [f"WARNING: {w}" for w in cached["warnings"]]
+                 + [f"Identical workbook already processed (task {source_id}). Reusing cached artifacts.",
+                    "Processing finished successfully."],
+            artifacts=cached["artifacts"],
+            cache_source=source_id
+        )
+        _remove_upload(upload_path)
+        TASKS_TOTAL.inc(status="completed")
+        return {"task_id": task_id, "message": "Upload successful, reused cached artifacts.", "cached": True}
+    
+    store.create(task_id, status="pending", logs=["File uploaded. Waiting for processing..."])
+    
+    try:
+        get_job_executor().submit(task_id, process_file_task, task_id, str(upload_path), filename,
+                                  content_key, parent_task_id, all_sheets, profile, tracing.current_context(),
+                                  on_done=functools.partial(_job_done, queued_at=time.monotonic()),
+                                  priority=JOB_PRIORITIES[priority])
+    except QueueFull as e:
+        store.delete(task_id)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return {"task_id": task_id, "message": "Upload successful, processing started."}
+
+def _validate_upload_options(filename: str, priority: str):
+    if os.path.splitext(filename)[1].lower() not in parser.SUPPORTED_EXTENSIONS:
+         raise HTTPException(status_code=400, detail=f"Invalid file format. Please upload one of: {', '.join(parser.SUPPORTED_EXTENSIONS)}")
+    if priority not in JOB_PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Invalid priority '{priority}'. Use one of: {', '.join(JOB_PRIORITIES)}")
+
+def _upload_state(session: dict, response: Response) -> dict:
+    response.headers["Upload-Offset"] = str(session["received"])
+    return {"upload_id": session["upload_id"], "filename": session["filename"], "size": session["size"],
+            "received": session["received"], "chunk_size": CHUNKED_UPLOAD_CHUNK_SIZE}
+
+def _get_upload_session(upload_id: str) -> dict:
+    session = get_upload_sessions().get(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload not found. It may have expired or been finalized.")
+    return session
+
+def _offset_conflict(detail: str, received: int):
+    return HTTPException(status_code=409, detail=detail, headers={"Upload-Offset": str(received)})
+
+@router.post("/uploads", status_code=201)
+def create_upload(response: Response, filename: str = Form(...), size: int = Form(...), sha256: str = Form(None),
+                  parent_task_id: str = Form(None), all_sheets: bool = Form(False), priority: str = Form("normal")):
+    """
+    Starts a chunked upload of a `size`-byte file. Send the bytes with PUT
+    /api/uploads/{upload_id}?offset=N, in order, each chunk with its SHA-256 in the
+    X-Chunk-SHA256 header; GET /api/uploads/{upload_id} tells where to resume after an
+    interruption. POST /api/uploads/{upload_id}/finalize then queues the task (its id is
+    the upload id), checking the whole file against `sha256` if it was given. Options
+    are those of /api/upload.
+    """
+    _validate_upload_options(filename, priority)
+    if size <= 0:
+        raise HTTPException(status_code=400, detail="size must be positive.")
+    session = get_upload_sessions().create(filename, size, sha256, {
+        "parent_task_id": parent_task_id, "all_sheets": all_sheets, "priority": priority
+    })
+    return _upload_state(session, response)
+
+@router.get("/uploads/{upload_id}")
+def get_upload(upload_id: str, response: Response):
+    return _upload_state(_get_upload_session(upload_id), response)
+
+@router.put("/uploads/{upload_id}")
+async def put_upload_chunk(upload_id: str, offset: int, request: Request, response: Response):
+    """
+    Writes the request body at `offset`, which must equal the bytes received so far
+    (else 409, with the right offset in Upload-Offset). The chunk only counts once its
+    SHA-256 matches X-Chunk-SHA256; a mismatch (422, also with Upload-Offset) or an
+    interrupted request leaves the upload where it was, so the chunk can be sent again.
+    """
+    sessions = get_upload_sessions()
+    session = _get_upload_session(upload_id)
+    checksum = request.headers.get("x-chunk-sha256", "").strip().lower()
+    if not checksum:
+        raise HTTPException(status_code=400, detail="X-Chunk-SHA256 header (hex SHA-256 of the chunk) is required.")
+    try:
+        with sessions.lock(upload_id), tracing.span("upload_chunk", parent=tracing.new_trace(upload_id, TRACE_EXPORTER),
+                                                    offset=offset) as span:
+            # Re-read under the lock: another worker may have taken a chunk meanwhile
+            session = _get_upload_session(upload_id)
+            if offset != session["received"]:
+                raise _offset_conflict(f"Expected offset {session['received']}, got {offset}.", session["received"])
+            hasher = hashlib.sha256()
+            length = 0
+            try:
+                async with aiofiles.open(sessions.part_path(upload_id), "r+b") as out:
+                    await out.seek(offset)
+                    async for data in request.stream():
+                        length += len(data)
+                        if offset + length > session["size"]:
+                            raise HTTPException(status_code=413, detail=f"Chunk goes past the declared size of {session['size']} bytes.")
+                        hasher.update(data)
+                        await out.write(data)
+                if length == 0:
+                    raise HTTPException(status_code=400, detail="Empty chunk.")
+                if hasher.hexdigest() != checksum:
+                    raise HTTPException(status_code=422, detail="Chunk checksum mismatch. Send the chunk again.",
+                                        headers={"Upload-Offset": str(offset)})
+            except BaseException as e:
+                os.truncate(sessions.part_path(upload_id), offset)
+                if isinstance(e, ClientDisconnect):
+                    raise HTTPException(status_code=400, detail="Chunk interrupted. Send it again.")
+                raise
+            span.set(bytes=length)
+            sessions.set_received(session, offset + length)
+    except UploadBusy:
+        raise _offset_conflict("Another chunk of this upload is being written.", session["received"])
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found. It may have expired or been finalized.")
+    return _upload_state(session, response)
+
+@router.post("/uploads/{upload_id}/finalize")
+async def finalize_upload(upload_id: str, profile: bool = False):
+    """
+    Queues the completed upload like /api/upload (including `?profile=true`). If the
+    job queue is full (429), the upload is kept so finalize can be retried after
+    Retry-After.
+    """
+    sessions = get_upload_sessions()
+    session = _get_upload_session(upload_id)
+    try:
+        with sessions.lock(upload_id), tracing.span("finalize_upload", parent=tracing.new_trace(upload_id, TRACE_EXPORTER),
+                                                    profile=profile):
+            session = _get_upload_session(upload_id)
+            if session["received"] != session["size"]:
+                raise _offset_conflict(f"Upload incomplete: received {session['received']} of {session['size']} bytes.",
+                                       session["received"])
+            options = session["options"]
+            # Same cache key as a single-request upload of the file
+            hasher = cache_hasher(session["filename"], {"all_sheets": True} if options["all_sheets"] else None)
+            file_hasher = hashlib.sha256()
+            with tracing.span("hash_upload", bytes=session["size"]):
+                await asyncio.to_thread(_hash_file, sessions.part_path(upload_id), (hasher, file_hasher))
+            if session["sha256"] and file_hasher.hexdigest() != session["sha256"]:
+                sessions.delete(upload_id)
+                raise HTTPException(status_code=422, detail="File checksum mismatch. Start the upload again.")
+            upload_path = UPLOADS_DIR / f"{upload_id}{os.path.splitext(session['filename'])[1].lower()}"
+            sessions.finish(upload_id, upload_path)
+            try:
+                return _start_task(upload_id, upload_path, session["filename"], hasher.hexdigest(),
+                                   options["parent_task_id"], options["all_sheets"], options["priority"], profile)
+            except HTTPException:
+                sessions.reopen(session, upload_path)
+                raise
+    except UploadBusy:
+        raise _offset_conflict("A chunk of this upload is being written.", session["received"])
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found. It may have expired or been finalized.")
+
+@router.delete("/uploads/{upload_id}")
+def abort_upload(upload_id: str):
+    _get_upload_session(upload_id)
+    get_upload_sessions().delete(upload_id)
+    return {"upload_id": upload_id, "status": "aborted"}
+
+def _hash_file(path: Path, hashers):
+    with open(path, "rb") as f:
+        while chunk := f.read(UPLOAD_CHUNK_SIZE):
+            for hasher in hashers:
+                hasher.update(chunk)
+
+def _not_modified(request: Request, etag: str) -> bool:
+    match = request.headers.get("if-none-match")
+    return bool(match) and (match.strip() == "*" or etag in [m.strip() for m in match.split(",")])
 
 @router.get("/status/{task_id}")
-async def get_status(task_id: str):
-    if task_id not in TASKS:
+async def get_status(task_id: str, request: Request, response: Response, since: int = 0):
+    """
+    Task status with the log lines from index `since` on; pass `next_log_index` back
+    as `since` on the next poll. The preview is served by /api/tasks/{task_id}/preview.
+    Polls with nothing new answer 304 to a matching If-None-Match.
+    """
+    store = get_task_store()
+    progress = store.get_progress(task_id)
+    if progress is None:
         raise HTTPException(status_code=404, detail="Task not found")
-    
+
+    since = max(0, min(since, progress["log_count"]))
+    state = json.dumps([since, progress["status"], progress["stage"], progress["log_count"], progress["artifacts"],
+                        progress["has_preview"]])
+    etag = f'W/"{hashlib.sha1(state.encode("utf-8")).hexdigest()[:16]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    # Lines appended after get_progress() are left for the next poll so the body matches the ETag
+    logs = store.get_logs(task_id, since)[:progress["log_count"] - since]
+    response.headers.update(headers)
     return {
         "task_id": task_id, 
-        "status": TASKS[task_id]["status"], 
-        "logs": TASKS[task_id]["logs"],
-        "api_preview": TASKS[task_id].get("api_preview", []),
-        "artifacts_ready": list(TASKS[task_id]["artifacts"].keys())
+        "status": progress["status"], 
+        "stage": progress["stage"],
+        "logs": logs,
+        "log_offset": since,
+        "next_log_index": since + len(logs),
+        "artifacts_ready": progress["artifacts"],
+        "preview_available": progress["has_preview"]
     }
 
+@router.get("/status/{task_id}/waterfall")
+async def get_waterfall(task_id: str, output_format: str = Query("json", alias="format")):
+    """
+    The task's trace spans (upload, parse, sheets and chunks, generators, artifact
+    writes) nested and ordered by start, with their offset from the upload; spans of
+    other processes carry their pid. `?format=text` draws them as a waterfall.
+    """
+    if output_format not in ("json", "text"):
+        raise HTTPException(status_code=400, detail="Invalid format. Use 'json' or 'text'.")
+    if not get_task_store().exists(task_id):
+        raise HTTPException(status_code=404, detail="Task not found")
+    if TRACE_EXPORTER is None:
+        raise HTTPException(status_code=404, detail="Tracing is disabled (TRACING=0).")
+    view = tracing.waterfall(await asyncio.to_thread(TRACE_EXPORTER.read, task_id))
+    if output_format == "text":
+        return Response(tracing.render_waterfall(view), media_type="text/plain")
+    return {"task_id": task_id, **view}
+
+@router.get("/tasks/{task_id}/events")
+async def task_events(task_id: str, request: Request, since: int = 0):
+    """
+    Server-Sent Events stream of a task: `logs` (new lines from `since` on), `stage`,
+    `status` and a final `complete` event, after which the stream ends. Event ids are
+    log cursors, so a reconnecting EventSource resumes via Last-Event-ID.
+    """
+    if get_task_store().get_progress(task_id) is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        since = int(last_event_id)
+    return StreamingResponse(
+        _task_event_stream(task_id, max(0, since), request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _task_event_stream(task_id: str, cursor: int, request: Request):
+    store = get_task_store()
+    hub = get_task_event_hub()
+    wake = hub.subscribe(task_id)
+    status = stage = None
+    try:
+        while True:
+            wake.clear()
+            progress = await asyncio.to_thread(store.get_progress, task_id)
+            if progress is None:
+                yield format_sse("complete", {"status": "deleted", "artifacts_ready": [], "preview_available": False})
+                return
+            if progress["log_count"] > cursor:
+                lines = await asyncio.to_thread(store.get_logs, task_id, cursor)
+                lines = lines[:progress["log_count"] - cursor]
+                yield format_sse("logs", {"offset": cursor, "lines": lines}, event_id=cursor + len(lines))
+                cursor += len(lines)
+            if progress["stage"] != stage:
+                stage = progress["stage"]
+                yield format_sse("stage", {"stage": stage})
+            if progress["status"] != status:
+                status = progress["status"]
+                yield format_sse("status", {"status": status})
+            if status in FINISHED_STATUSES:
+                yield format_sse("complete", {
+                    "status": status,
+                    "artifacts_ready": progress["artifacts"],
+                    "preview_available": progress["has_preview"]
+                })
+                return
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=TASK_EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+    finally:
+        hub.unsubscribe(task_id, wake)
+
+@router.delete("/tasks/{task_id}")
+def cancel_task(task_id: str, response: Response):
+    """
+    Cancels a pending or processing task. A job still queued in this worker is dropped
+    right away (200, "cancelled"); otherwise the job is flagged and stops at its next
+    stage or row boundary, removing its partial artifacts (202, "cancelling").
+    """
+    store = get_task_store()
+    status = store.get_status(task_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if status in FINISHED_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Task already {status}.")
+
+    store.request_cancel(task_id)
+    if status == "pending" and get_job_executor().cancel(task_id):
+        for upload_path in UPLOADS_DIR.glob(f"{task_id}.*"):
+            _remove_upload(upload_path)
+        store.append_log(task_id, "Cancelled by user before processing started.")
+        store.set_status(task_id, "cancelled")
+        TASKS_TOTAL.inc(status="cancelled")
+        return {"task_id": task_id, "status": "cancelled"}
+    response.status_code = 202
+    return {"task_id": task_id, "status": "cancelling"}
+
+@router.get("/tasks/{task_id}/preview")
+async def get_preview(task_id: str, request: Request, response: Response):
+    store = get_task_store()
+    progress = store.get_progress(task_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if not progress["has_preview"]:
+        raise HTTPException(status_code=404, detail="Preview not ready.")
+
+    # A task's preview is written once and never changes
+    etag = f'"preview-{task_id}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    apis = store.get_preview(task_id)
+    response.headers.update(headers)
+    return {"task_id": task_id, "count": len(apis), "apis": apis}
+
 @router.get("/download/{task_id}/{file_type}")
-async def download_file(task_id: str, file_type: str):
-    if task_id not in TASKS:
+async def download_file(task_id: str, file_type: str, output_format: str = Query("pstats", alias="format")):
+    """
+    Sends an artifact. Stored files support Range requests (resuming an interrupted
+    download); a pytest project kept as blobs (PYTEST_ARTIFACT_STORAGE=blobs) is
+    zipped while it is sent, so its first bytes go out right away, but it cannot be
+    resumed. The profile of a task run with ?profile=true is sent as pstats, or with
+    ?format=collapsed as collapsed stacks (e.g. for flamegraph.pl or speedscope).
+    """
+    store = get_task_store()
+    if not store.exists(task_id):
         raise HTTPException(status_code=404, detail="Task not found")
         
-    artifacts = TASKS[task_id].get("artifacts", {})
+    artifacts = store.get_artifacts(task_id)
     if file_type not in artifacts:
         raise HTTPException(status_code=404, detail=f"Artifact '{file_type}' not found or not ready.")
         
     file_path = artifacts[file_type]
+    if file_type == "profile":
+        if output_format not in ("pstats", "collapsed"):
+            raise HTTPException(status_code=400, detail="Invalid profile format. Use 'pstats' or 'collapsed'.")
+        if output_format == "collapsed":
+            file_path = os.path.join(os.path.dirname(file_path), profiling.COLLAPSED_FILENAME)
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail=f"Artifact '{file_type}' has been removed by the retention policy.")
     filename = os.path.basename(file_path)
+    store.touch(task_id)
     
-    media_type = "application/json" if file_type == "postman" else "application/zip"
+    media_type = {"postman": "application/json", "profile": "application/octet-stream"}.get(file_type, "application/zip")
+    if filename == profiling.COLLAPSED_FILENAME:
+        media_type = "text/plain"
+
+    if file_type == "pytest" and filename == pytest_generator.PROJECT_SOURCES_FILENAME:
+        try:
+            files = await asyncio.to_thread(pytest_generator.load_project_files, file_path, get_blob_store())
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail=f"Artifact '{file_type}' has been removed by the retention policy.")
+        return StreamingResponse(
+            pytest_generator.stream_zip(files, ZIP_COMPRESSION_LEVEL),
+            media_type=media_type,
+            headers={"Content-Disposition": 'attachment; filename="pytest_tests.zip"', "Accept-Ranges": "none"}
+        )
     
     return FileResponse(file_path, media_type=media_type, filename=filename)
 
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return get_artifact_cache().stats()
+
+@router.get("/blobs/stats")
+async def get_blob_stats():
+    return await asyncio.to_thread(get_blob_store().stats)
+
+@router.get("/jobs/stats")
+async def get_job_stats():
+    stats = get_job_executor().stats()
+    names = {rank: name for name, rank in JOB_PRIORITIES.items()}
+    stats["queue_depth_by_priority"] = {names.get(rank, str(rank)): depth
+                                        for rank, depth in sorted(stats["queue_depth_by_priority"].items())}
+    return stats
+
+@router.get("/retention/stats")
+async def get_retention_stats():
+    return get_retention_sweeper().stats()
 
+@router.post("/retention/sweep")
+def run_retention_sweep():
+    report = get_retention_sweeper().run_once()
+    if report is None:
+        raise HTTPException(status_code=409, detail="Another worker is sweeping right now.")
+    return report
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None # Windows: the index is only guarded within the process
+
+# Bump whenever parser or generator output changes so stale cache entries stop matching.
+GENERATOR_VERSION = "4"
+
+def cache_key(file_content: bytes, filename: str, options: dict = None) -> str:
+    """
+    Key for a workbook upload: SHA-256 over the generator version, the file name
+    (it ends up in the Postman collection name), any parse options that change the
+    output, and the file bytes.
+    """
+    h = cache_hasher(filename, options)
+    h.update(file_content)
+    return h.hexdigest()
+
+def cache_hasher(filename: str, options: dict = None):
+    """
+    Hash object primed like cache_key(); feed it the file bytes chunk by chunk with
+    update() while streaming an upload, then hexdigest() gives the same key.
+    """
+    h = hashlib.sha256()
+    h.update(f"{GENERATOR_VERSION}\0{filename}\0{json.dumps(options or {}, sort_keys=True)}\0".encode("utf-8"))
+    return h
+
+class ArtifactCache:
+    """
+    LRU index from upload content hash to the artifacts of the task that produced them.
+
+    Only the index lives here; artifacts stay in their task directory and belong to
+    that task. Entries are bounded by count, and evicting one only forgets it: disk
+    use is bounded by the retention policy (services/retention.py), which also drops
+    the entries of the tasks it deletes. The index is persisted to `index_path` so it
+    survives restarts. Hit/miss/eviction counters are per process.
+
+    Several server worker processes may share one index: every operation holds an
+    exclusive lock on `<index>.lock`, reloads the index if another process changed
+    it, and replaces the file atomically when saving.
+    """
+
+    def __init__(self, index_path: Path, max_entries: int = 64):
+        self.index_path = Path(index_path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._lock_path = self.index_path.with_name(self.index_path.name + ".lock")
+        self._entries = OrderedDict()
+        self._loaded_stamp = None
+        self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: str):
+        """Returns the cached entry for `key` (marking it most recently used), or None."""
+        if not self.enabled:
+            return None
+        with self._locked():
+            entry = self._entries.get(key)
+            if entry and not all(os.path.exists(p) for p in entry["artifacts"].values()):
+                # Artifacts were removed from disk behind our back
+                del self._entries[key]
+                self._save()
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self._save()
+            return entry
+
+    def put(self, key: str, task_id: str, artifacts: dict, warnings: list):
+        if not self.enabled:
+            return
+        size = sum(os.path.getsize(p) for p in artifacts.values() if os.path.exists(p))
+        with self._locked():
+            self._entries[key] = {
+                "task_id": task_id,
+                "artifacts": dict(artifacts),
+                "warnings": list(warnings),
+                "size_bytes": size
+            }
+            self._entries.move_to_end(key)
+            self._evict()
+            self._save()
+
+    def drop_task(self, task_id: str):
+        """Forgets entries whose artifacts belong to `task_id` (its directory is being deleted)."""
+        with self._locked():
+            stale = [key for key, entry in self._entries.items() if entry["task_id"] == task_id]
+            for key in stale:
+                del self._entries[key]
+            if stale:
+                self._save()
+
+    def stats(self) -> dict:
+        with self._locked():
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "size_bytes": sum(e["size_bytes"] for e in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is None:
+                self._load()
+                yield
+                return
+            with open(self._lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._load()
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.index_path)
+            return (st.st_mtime_ns, st.st_size, st.st_ino)
+        except OSError:
+            return None
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _load(self):
+        """Re-reads the index if it changed on disk since we last loaded or saved it."""
+        stamp = self._stamp()
+        if stamp == self._loaded_stamp:
+            return
+        self._loaded_stamp = stamp
+        if stamp is None:
+            self._entries = OrderedDict()
+            return
+        try:
+            with open(self.index_path, "r") as f:
+                self._entries = OrderedDict(json.load(f))
+        except Exception:
+            self._entries = OrderedDict()
+
+    def _save(self):
+        tmp_path = self.index_path.with_name(f"{self.index_path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.index_path)
+            self._loaded_stamp = self._stamp()
+        except Exception as e:
+            print(f"Failed to save artifact cache index: {e}")
@@ -0,0 +1,136 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+def blob_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+class BlobStore:
+    """
+    Content-addressed storage for generated files, shared by all tasks. Each distinct
+    content is kept once, as `<root>/<first 2 hex digits>/<sha256>`, no matter how many
+    tasks produced it (the conftest, requirements and report template of most tasks,
+    and the test files of unchanged rows).
+
+    Tasks reference blobs through the index (SQLite, WAL, `<root>/index.db`, shared by
+    server workers and job processes); `refs` counts the tasks referencing a blob.
+    release(task_id) drops a task's references and deletes the blobs no task uses any
+    more. Blob files are written and deleted inside the index transaction that adds or
+    drops their last reference, so a blob with references is always on disk.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS blobs (
+            digest TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            refs INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS task_blobs (
+            task_id TEXT NOT NULL,
+            digest TEXT NOT NULL,
+            PRIMARY KEY (task_id, digest)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        with conn:
+            conn.executescript(self.SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # Same rules as SqliteTaskStore: one connection per thread and per process
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.root / "index.db", timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def put_many(self, task_id: str, contents: list, existing=()) -> tuple[list, set]:
+        """
+        Stores `contents` (bytes) for `task_id`. Only contents not stored yet are written.
+        `existing` digests (e.g. of files reused from a parent task) are referenced
+        without their content. Returns the digests of `contents` and the set of
+        `existing` digests that are no longer stored (and so not referenced): the caller
+        has to put their content again.
+        """
+        digests = [blob_digest(data) for data in contents]
+        new = dict(zip(digests, contents))
+        missing = set()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for digest in set(existing) - set(new):
+                if conn.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone() is None:
+                    missing.add(digest)
+                    continue
+                self._add_ref(conn, task_id, digest)
+            for digest, data in new.items():
+                if conn.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone() is None:
+                    self._write(digest, data)
+                    conn.execute("INSERT INTO blobs VALUES (?, ?, 0)", (digest, len(data)))
+                self._add_ref(conn, task_id, digest)
+        return digests, missing
+
+    def _add_ref(self, conn, task_id: str, digest: str):
+        if conn.execute("INSERT OR IGNORE INTO task_blobs VALUES (?, ?)", (task_id, digest)).rowcount:
+            conn.execute("UPDATE blobs SET refs = refs + 1 WHERE digest = ?", (digest,))
+
+    def _write(self, digest: str, data: bytes):
+        path = self.path(digest)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_name(f"{digest}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get(self, digest: str) -> bytes:
+        """Raises FileNotFoundError for an unknown or deleted blob."""
+        with open(self.path(digest), "rb") as f:
+            return f.read()
+
+    def release(self, task_id: str) -> int:
+        """Drops the references of `task_id`; returns the bytes of the blobs deleted as a result."""
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            digests = [row[0] for row in conn.execute("SELECT digest FROM task_blobs WHERE task_id = ?", (task_id,))]
+            conn.execute("DELETE FROM task_blobs WHERE task_id = ?", (task_id,))
+            conn.executemany("UPDATE blobs SET refs = refs - 1 WHERE digest = ?", [(digest,) for digest in digests])
+            unused = [(digest, row[0]) for digest in digests
+                      for row in conn.execute("SELECT size FROM blobs WHERE digest = ? AND refs <= 0", (digest,))]
+            conn.executemany("DELETE FROM blobs WHERE digest = ?", [(digest,) for digest, _ in unused])
+            for digest, _ in unused:
+                try:
+                    os.remove(self.path(digest))
+                except OSError:
+                    pass
+        return sum(size for _, size in unused)
+
+    def stored_bytes(self) -> int:
+        return self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        blobs, stored = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        tasks, referenced = conn.execute(
+            "SELECT COUNT(DISTINCT t.task_id), COALESCE(SUM(b.size), 0) "
+            "FROM task_blobs t JOIN blobs b ON b.digest = t.digest").fetchone()
+        return {
+            "blobs": blobs,
+            "tasks": tasks,
+            "stored_bytes": stored,
+            # What the same files would take stored once per task
+            "referenced_bytes": referenced,
+            "dedup_ratio": round(referenced / stored, 2) if stored else None
+        }
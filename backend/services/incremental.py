@@ -0,0 +1,132 @@
+import hashlib
+import json
+import zipfile
+from pathlib import Path
+
+ROW_INDEX_FILENAME = "rows.json"
+
+def row_fingerprint(api: dict) -> str:
+    """
+    Stable per-row fingerprint: the Ref ID plus a hash of the parsed row content.
+    Must be taken before the generators run, as they add default headers in place.
+    """
+    digest = hashlib.sha256(json.dumps(api, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f"{api.get('ref_id', '')}:{digest[:24]}"
+
+class ParentArtifacts:
+    """
+    Reads the outputs of a parent task's rows back out of its artifacts (kind -> path),
+    opening each artifact once. A row index entry only points at where the row's output
+    is, see RowCache.put().
+    """
+
+    def __init__(self, artifacts: dict = None):
+        self.artifacts = artifacts or {}
+        self._opened = {}
+
+    def _open(self, kind: str):
+        if kind not in self._opened:
+            path = self.artifacts.get(kind)
+            try:
+                if kind == "postman":
+                    with open(path, "r") as f:
+                        self._opened[kind] = {folder["name"]: folder["item"] for folder in json.load(f)["item"]}
+                else:
+                    self._opened[kind] = zipfile.ZipFile(path)
+            except Exception:
+                self._opened[kind] = None
+        return self._opened[kind]
+
+    def resolve(self, kind: str, ref: dict):
+        """The output `ref` points at, in the form the generator put() it; None if it is gone."""
+        if "blob" in ref:
+            # The blob store checks that the blob still exists when the project is stored
+            return [ref["file"], ref["blob"]]
+        source = self._open(kind)
+        if source is None:
+            return None
+        try:
+            if "path" in ref:
+                return [ref["file"], source.read(ref["path"]).decode("utf-8")]
+            return source[ref["folder"]][ref["index"]]
+        except (KeyError, IndexError, UnicodeDecodeError, zipfile.BadZipFile):
+            return None
+
+class RowCache:
+    """
+    Per-row generation results of a task, keyed by row fingerprint.
+
+    Generators look rows up with get() and record with put() where the row's output
+    ends up in the task's artifacts: the Postman folder and index, the file in the
+    pytest zip, or the test file's blob. Only these references are saved with the
+    task, so the row index stays small; a task built against it as parent reads the
+    outputs back from the parent's artifacts (`parent_artifacts`). Entries are only
+    reused when they were rendered with the same context (e.g. same base URL
+    variable), so the output matches a full rebuild.
+    """
+
+    def __init__(self, apis: list, parent_rows: dict = None, parent_artifacts: dict = None):
+        self._fingerprints = {id(api): row_fingerprint(api) for api in apis}
+        self._parent = parent_rows or {}
+        self._parent_artifacts = ParentArtifacts(parent_artifacts)
+        self.rows = {}
+        self.added = sum(1 for fp in self._fingerprints.values() if fp not in self._parent)
+        self.removed = len(set(self._parent) - set(self._fingerprints.values()))
+        self.reused = {}
+        self.regenerated = {}
+
+    def get(self, kind: str, api: dict, context: dict):
+        fp = self._fingerprints.get(id(api))
+        entry = self._parent.get(fp, {}).get(kind)
+        value = None
+        if entry is not None and entry["context"] == context:
+            value = self._parent_artifacts.resolve(kind, entry["ref"])
+        if value is not None:
+            self.reused[kind] = self.reused.get(kind, 0) + 1
+            return value
+        self.regenerated[kind] = self.regenerated.get(kind, 0) + 1
+        return None
+
+    def miss(self, kind: str, count: int = 1):
+        """Counts `count` rows get() returned as regenerated after all (their output was gone)."""
+        self.reused[kind] = self.reused.get(kind, 0) - count
+        self.regenerated[kind] = self.regenerated.get(kind, 0) + count
+
+    def put(self, kind: str, api: dict, context: dict, ref: dict):
+        fp = self._fingerprints.get(id(api))
+        self.rows.setdefault(fp, {})[kind] = {"context": context, "ref": ref}
+
+    def export(self, kind: str) -> dict:
+        """What one generator recorded (its rows and counters), for merge() into another RowCache."""
+        return {
+            "rows": {fp: {kind: entry[kind]} for fp, entry in self.rows.items() if kind in entry},
+            "reused": self.reused.get(kind, 0),
+            "regenerated": self.regenerated.get(kind, 0)
+        }
+
+    def merge(self, kind: str, exported: dict):
+        """Takes over the results of a generator that ran on a copy of this cache (e.g. in a child process)."""
+        for fp, entry in exported["rows"].items():
+            self.rows.setdefault(fp, {})[kind] = entry[kind]
+        self.reused[kind] = exported["reused"]
+        self.regenerated[kind] = exported["regenerated"]
+
+    def summary(self) -> str:
+        parts = [f"{kind}: {self.reused.get(kind, 0)} reused, {self.regenerated.get(kind, 0)} regenerated"
+                 for kind in sorted(set(self.reused) | set(self.regenerated))]
+        return (f"{len(self._fingerprints) - self.added} rows unchanged, {self.added} added or changed, "
+                f"{self.removed} parent rows no longer present ({'; '.join(parts)})")
+
+def load_row_index(task_dir) -> dict:
+    path = Path(task_dir) / ROW_INDEX_FILENAME
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def save_row_index(task_dir, row_cache: RowCache):
+    with open(Path(task_dir) / ROW_INDEX_FILENAME, "w") as f:
+        json.dump(row_cache.rows, f)
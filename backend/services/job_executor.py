@@ -0,0 +1,328 @@
+import concurrent.futures
+import heapq
+import importlib
+import itertools
+import math
+import multiprocessing
+import os
+import threading
+import time
+
+class QueueFull(Exception):
+    """Raised by JobExecutor.submit() when the queue is at capacity."""
+
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+        super().__init__(f"Job queue is full. Retry in about {retry_after} s.")
+
+# Set in job worker processes (see _init_worker) so they can report task changes
+_notify_queue = None
+
+def _init_worker(notify_queue, warm_modules):
+    global _notify_queue
+    _notify_queue = notify_queue
+    # Pre-warm: pay the pandas / openpyxl / generator import cost before the first job arrives
+    for name in warm_modules:
+        importlib.import_module(name)
+
+def _warm_up():
+    # Busy for a moment so each warm-up call lands on a different, newly started worker
+    time.sleep(0.2)
+    return os.getpid()
+
+def notify_parent(task_id: str) -> bool:
+    """In a job worker process: tells the server process that `task_id` changed. False elsewhere."""
+    if _notify_queue is None:
+        return False
+    _notify_queue.put(task_id)
+    return True
+
+def fork_available() -> bool:
+    return "fork" in multiprocessing.get_all_start_methods()
+
+def _child_main(fn, sender):
+    try:
+        result = (True, fn())
+    except BaseException as e:
+        result = (False, e)
+    try:
+        sender.send(result)
+    except Exception: # unpicklable result or exception
+        sender.send((False, RuntimeError(repr(result[1]))))
+    sender.close()
+
+class ForkedCall:
+    """
+    fn() running in a forked child process. The child starts with a copy of this
+    process's memory, so fn can work on large in-memory data without it being pickled;
+    only its result (which must be picklable) is sent back.
+
+    Fork from a single thread (e.g. before starting other threads in a job): a lock
+    held by another thread at that moment stays locked forever in the child.
+    """
+
+    def __init__(self, fn):
+        ctx = multiprocessing.get_context("fork")
+        self._receiver, sender = ctx.Pipe(duplex=False)
+        self._child = ctx.Process(target=_child_main, args=(fn, sender), name="job-child")
+        self._child.start()
+        sender.close()
+
+    def result(self, check=None, poll_interval: float = 0.5):
+        """
+        Waits for fn's result, re-raising its exception. check() is called every
+        `poll_interval` seconds while waiting; if it raises, the child is terminated
+        and the exception propagates.
+        """
+        try:
+            while not self._receiver.poll(poll_interval):
+                if check is not None:
+                    check()
+            try:
+                ok, value = self._receiver.recv()
+            except EOFError:
+                self._child.join()
+                raise RuntimeError(f"Child process exited with code {self._child.exitcode} before returning a result")
+        except BaseException:
+            self._child.terminate()
+            raise
+        finally:
+            self._child.join()
+            self._receiver.close()
+        if not ok:
+            raise value
+        return value
+
+class JobExecutor:
+    """
+    Runs jobs on a fixed number of worker processes (or threads) fed from a bounded
+    priority queue: lower `priority` values run first, FIFO within a priority.
+
+    Worker processes are spawned rather than forked: the server process runs several
+    threads, and a fork would copy any lock one of them holds in its locked state.
+
+    submit() raises QueueFull once `max_queue` jobs are waiting, with a Retry-After
+    estimate from the recent average run time. start() launches the worker processes
+    and returns without waiting for them to import `warm_modules`; stats() reports
+    when they are ready, and jobs submitted meanwhile queue behind the warm-up. A pool
+    replaced after a worker died is warmed up the same way. Jobs in worker processes
+    report task changes with notify_parent(); the server process receives them
+    through `on_notify(task_id)`.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, mode: str = "process", warm_modules=(),
+                 on_notify=None):
+        if mode not in ("process", "thread"):
+            raise ValueError(f"Unknown job executor mode '{mode}'. Use 'process' or 'thread'.")
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max_queue
+        self.mode = mode
+        self.warm_modules = list(warm_modules)
+        self.on_notify = on_notify
+        self._cond = threading.Condition()
+        self._queue = [] # heap of (priority, seq, job)
+        self._seq = itertools.count()
+        self._running = 0
+        self._pool = None
+        self._notify_queue = None
+        self._mp_context = multiprocessing.get_context("spawn")
+        self._started = False
+        self._closed = False
+        # Counters and moving averages (seconds) for stats() and Retry-After
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.avg_wait = 0.0
+        self.avg_run = None
+        self.max_wait = 0.0
+        # Warm-up of the current pool's workers (see _warm_up_pool())
+        self.pools_started = 0
+        self.workers_warm = 0
+        self.warm_up_seconds = None
+        self.warm_up_error = None
+
+    def start(self):
+        """Starts the pool and dispatcher; process workers warm up in the background."""
+        with self._cond:
+            if self._started:
+                return
+            self._pool = pool = self._new_pool()
+            self._started = True
+        threading.Thread(target=self._dispatch, name="job-dispatcher", daemon=True).start()
+        if self.mode == "process":
+            threading.Thread(target=self._relay_notifications, name="job-notify", daemon=True).start()
+        self._warm_up_pool(pool)
+
+    def _warm_up_pool(self, pool):
+        """
+        Submits one warm-up call per worker, which makes the pool start its processes
+        and import `warm_modules`, without waiting for them. A failure is reported in
+        stats() rather than raised: the jobs sent to a broken pool fail on their own.
+        """
+        if self.mode != "process":
+            return
+        with self._cond:
+            self.pools_started += 1
+            self.workers_warm = 0
+            self.warm_up_seconds = None
+            self.warm_up_error = None
+        started = time.perf_counter()
+        pids = set()
+
+        def warmed(future):
+            with self._cond:
+                if pool is not self._pool:
+                    return
+                error = future.exception()
+                if error is not None:
+                    self.warm_up_error = repr(error)
+                    return
+                pids.add(future.result())
+                self.workers_warm += 1
+                if self.workers_warm == self.max_workers:
+                    self.warm_up_seconds = time.perf_counter() - started
+                    print(f"Started {len(pids)} job worker processes in {self.warm_up_seconds * 1000:.0f} ms")
+
+        for _ in range(self.max_workers):
+            try:
+                future = pool.submit(_warm_up)
+            except Exception as e: # pool broken or shut down
+                future = concurrent.futures.Future()
+                future.set_exception(e)
+            future.add_done_callback(warmed)
+
+    def _new_pool(self):
+        if self.mode == "thread":
+            return concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        if self._notify_queue is None:
+            self._notify_queue = self._mp_context.SimpleQueue()
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=self._mp_context, initializer=_init_worker,
+            initargs=(self._notify_queue, self.warm_modules))
+
+    def submit(self, job_id: str, fn, *args, on_done=None, priority: int = 0):
+        """
+        Queues fn(*args). on_done(job_id, error, result) runs after the job, with fn's
+        return value, or the exception if the job could not run to completion (e.g. its
+        worker process died).
+        """
+        self.start()
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise QueueFull(self.retry_after())
+            job = {"job_id": job_id, "fn": fn, "args": args, "on_done": on_done, "priority": priority,
+                   "queued_at": time.monotonic()}
+            heapq.heappush(self._queue, (priority, next(self._seq), job))
+            self._cond.notify_all()
+            return len(self._queue)
+
+    def cancel(self, job_id: str) -> bool:
+        """Removes a job that is still queued. False if it already started (or is unknown)."""
+        with self._cond:
+            for i, (_, _, job) in enumerate(self._queue):
+                if job["job_id"] == job_id:
+                    self._queue.pop(i)
+                    heapq.heapify(self._queue)
+                    self.cancelled += 1
+                    return True
+            return False
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up, from the average run time."""
+        avg_run = self.avg_run if self.avg_run is not None else 10.0
+        return max(1, math.ceil(avg_run * (len(self._queue) + 1) / self.max_workers))
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._closed and (not self._queue or self._running >= self.max_workers):
+                    self._cond.wait()
+                if self._closed:
+                    return
+                _, _, job = heapq.heappop(self._queue)
+                self._running += 1
+                wait = time.monotonic() - job["queued_at"]
+                self.avg_wait = wait if self.completed + self.failed == 0 else 0.8 * self.avg_wait + 0.2 * wait
+                self.max_wait = max(self.max_wait, wait)
+                pool = job["pool"] = self._pool
+            job["started_at"] = time.monotonic()
+            try:
+                future = pool.submit(job["fn"], *job["args"])
+            except Exception as e: # pool broken or shut down
+                future = concurrent.futures.Future()
+                future.set_exception(e)
+            future.add_done_callback(lambda f, job=job: self._finished(job, f))
+
+    def _finished(self, job, future):
+        error = future.exception()
+        run = time.monotonic() - job["started_at"]
+        broken = replacement = None
+        with self._cond:
+            self._running -= 1
+            self.avg_run = run if self.avg_run is None else 0.8 * self.avg_run + 0.2 * run
+            if error is None:
+                self.completed += 1
+            else:
+                self.failed += 1
+                # A worker died (e.g. out of memory); the pool cannot be used any more. Every job
+                # in the broken pool fails, so only the first of them replaces it.
+                if (isinstance(error, concurrent.futures.process.BrokenProcessPool) and not self._closed
+                        and job["pool"] is self._pool):
+                    broken, self._pool = self._pool, self._new_pool()
+                    replacement = self._pool
+            self._cond.notify_all()
+        if broken is not None:
+            broken.shutdown(wait=False)
+            self._warm_up_pool(replacement)
+        if job["on_done"] is not None:
+            job["on_done"](job["job_id"], error, future.result() if error is None else None)
+
+    def _relay_notifications(self):
+        while not self._closed:
+            try:
+                task_id = self._notify_queue.get()
+            except (EOFError, OSError):
+                return
+            if self.on_notify is not None:
+                self.on_notify(task_id)
+
+    def stats(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            by_priority = {}
+            for priority, _, _ in self._queue:
+                by_priority[priority] = by_priority.get(priority, 0) + 1
+            return {
+                "mode": self.mode,
+                "workers": self.max_workers,
+                # Thread workers need no warm-up
+                "ready": self.mode == "thread" or (self._started and self.workers_warm >= self.max_workers),
+                "workers_warm": self.workers_warm if self.mode == "process" else self.max_workers,
+                "warm_up_seconds": round(self.warm_up_seconds, 3) if self.warm_up_seconds is not None else None,
+                "warm_up_error": self.warm_up_error,
+                "pools_started": self.pools_started,
+                "max_queue": self.max_queue,
+                "queue_depth": len(self._queue),
+                "queue_depth_by_priority": by_priority,
+                "running": self._running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "cancelled": self.cancelled,
+                "oldest_wait_seconds": round(now - min(job["queued_at"] for _, _, job in self._queue), 3)
+                                       if self._queue else 0.0,
+                "avg_wait_seconds": round(self.avg_wait, 3),
+                "max_wait_seconds": round(self.max_wait, 3),
+                "avg_run_seconds": round(self.avg_run, 3) if self.avg_run is not None else None,
+                "retry_after_seconds": self.retry_after()
+            }
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            pool = self._pool
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -1,14 +1,61 @@
-import pandas as pd
 import io
 import json
+import os
+from contextlib import contextmanager
+from . import tracing
 
-def parse_xlsx(file_content: bytes) -> tuple[dict, list[str]]:
+# pandas, openpyxl and the process pool machinery are imported inside the functions
+# that need them, so importing this module stays cheap on cold start.
+
+# Mapping: Normalized -> Internal Key
+COL_MAP = {
+    "ref id": "ref_id",
+    "module/feature": "module",
+    "api name": "name",
+    "http method": "method",
+    "endpoint url": "url",
+    "headers required": "headers",
+    "request payload (json example)": "body",
+    "url params": "url_params",
+    "expected response (success)": "expected_response",
+    "auth scope": "auth_scope",
+    "token variable": "token_variable",
+    "is token generator": "is_token_generator"
+}
+
+REQUIRED_KEYS = ["name", "method", "url"]
+
+# Upload formats understood by parse_file()
+SUPPORTED_EXTENSIONS = [".xlsx", ".csv", ".tsv", ".jsonl"]
+
+# Sheets smaller than this are decoded inline; below it a process pool costs more than it saves
+PARALLEL_DECODE_MIN_ROWS = 2000
+DECODE_CHUNK_MIN_ROWS = 250
+
+@tracing.traced("parse_xlsx")
+def parse_xlsx(source, mode: str = "pandas", workers: int = None, all_sheets: bool = False) -> tuple[dict, list[str]]:
     """
-    Parses the API Documentation XLSX.
+    Parses the API Documentation XLSX (source: file bytes or a path to the file).
     Expects columns: Ref ID, Module/Feature, API Name, HTTP Method, Endpoint URL, Headers Required, Request Payload, Expected Response
+
+    mode="stream" reads the workbook row by row with openpyxl (read-only) instead of
+    loading whole sheets into DataFrames; the items are still returned as one list.
+    See iter_xlsx_apis().
+    workers caps the process pool used to decode the JSON cells of large sheets
+    (default: one per CPU, 1 disables the pool).
+    all_sheets=True treats every sheet with the required columns as an API sheet,
+    see _parse_all_sheets().
     """
+    tracing.set_attributes(mode=mode, all_sheets=all_sheets)
+    if all_sheets:
+        return _parse_all_sheets(source, mode, workers)
+    if mode == "stream":
+        return _parse_xlsx_streaming(source)
+
+    import pandas as pd
+
     print("[PARSER] Starting parse_xlsx...")
-    print(f"[PARSER] Received {len(file_content)} bytes")
+    print(f"[PARSER] Received {_source_size(source)} bytes")
     
     warnings = []
     output = {
@@ -19,7 +66,7 @@ def parse_xlsx(file_content: bytes) -> tuple[dict, list[str]]:
 
     try:
         print("[PARSER] Creating ExcelFile object...")
-        xls = pd.ExcelFile(io.BytesIO(file_content))
+        xls = pd.ExcelFile(_as_file(source))
         print(f"[PARSER] ExcelFile created. Sheets: {xls.sheet_names}")
     except Exception as e:
         print(f"[PARSER] ERROR creating ExcelFile: {e}")
@@ -34,7 +81,9 @@ def parse_xlsx(file_content: bytes) -> tuple[dict, list[str]]:
         target_sheet = xls.sheet_names[0]
     
     print(f"[PARSER] Using sheet: {target_sheet}")
-    df = pd.read_excel(xls, sheet_name=target_sheet)
+    # dtype=str keeps IDs such as customerId as written (no 20955 -> 20955.0)
+    with tracing.span("read_sheet", sheet=target_sheet):
+        df = pd.read_excel(xls, sheet_name=target_sheet, dtype=str)
     print(f"[PARSER] Sheet loaded. Shape: {df.shape}")
 
     # --- 1b. Parse Environments Sheet (Optional) ---
@@ -60,154 +109,622 @@ def parse_xlsx(file_content: bytes) -> tuple[dict, list[str]]:
              print("[PARSER] 'environments' sheet found but could not identify Key/Value columns. Skipping.")
 
     
-    # helper to normalize col name for matching
-    def norm(c): return str(c).strip().lower().replace('\n', ' ')
-
-    # Mapping: Normalized -> Internal Key
-    col_map = {
-        "ref id": "ref_id",
-        "module/feature": "module",
-        "api name": "name",
-        "http method": "method",
-        "endpoint url": "url",
-        "headers required": "headers",
-        "request payload (json example)": "body",
-        "url params": "url_params",
-        "expected response (success)": "expected_response",
-        "auth scope": "auth_scope",
-        "token variable": "token_variable",
-        "is token generator": "is_token_generator"
+    found_map, missing = _match_columns(df.columns)
+
+    if missing:
+        return None, [f"Missing required columns in sheet '{target_sheet}': {', '.join(missing)}"]
+
+    # Normalize column-wise, then only JSON decoding runs per cell
+    records = list(_normalize_frame(df, found_map, output["env"]))
+    items, decode_warnings = _decode_records(records, workers)
+    output["apis"].extend(items)
+    warnings.extend(decode_warnings)
+
+    return output, warnings
+
+@tracing.traced("parse_file")
+def parse_file(source, filename: str, mode: str = "pandas", workers: int = None, all_sheets: bool = False) -> tuple[dict, list[str]]:
+    """
+    Parses an API catalogue by file extension: .xlsx workbooks go through parse_xlsx,
+    .csv / .tsv / .jsonl exports through the streaming readers. All formats share the
+    same column mapping and row normalization and return the same structure.
+    """
+    ext = os.path.splitext(filename or "")[1].lower()
+    tracing.set_attributes(format=ext.lstrip("."), bytes=_source_size(source))
+    if ext == ".csv":
+        return _collect(lambda env, warnings: iter_delimited_apis(source, ",", env, warnings))
+    if ext == ".tsv":
+        return _collect(lambda env, warnings: iter_delimited_apis(source, "\t", env, warnings))
+    if ext == ".jsonl":
+        return _collect(lambda env, warnings: iter_jsonl_apis(source, env, warnings))
+    return parse_xlsx(source, mode=mode, workers=workers, all_sheets=all_sheets)
+
+def _parse_all_sheets(source, mode: str = "pandas", workers: int = None) -> tuple[dict, list[str]]:
+    """
+    Multi-sheet mode: every sheet whose header row has the required columns is an
+    API sheet (one sheet per module). Sheets are parsed concurrently on the process
+    pool, the sheet name is the fallback for a blank Module/Feature cell, and results
+    are merged in workbook order. Warnings are prefixed with the sheet name.
+    """
+    import openpyxl
+
+    output = {
+        "apis": [],
+        "env": {},
+        "rules": {}
     }
+    try:
+        wb = openpyxl.load_workbook(_as_file(source), read_only=True, data_only=True)
+    except Exception as e:
+        print(f"[PARSER] ERROR opening workbook: {e}")
+        return None, [f"Failed to read Excel file: {str(e)}"]
+
+    try:
+        if "environments" in wb.sheetnames:
+            _read_env_rows(wb["environments"].iter_rows(values_only=True), output["env"])
+        api_sheets = []
+        for name in wb.sheetnames:
+            if name == "environments":
+                continue
+            header = next(wb[name].iter_rows(min_row=1, max_row=1, values_only=True), ())
+            if not _match_columns(header)[1]:
+                api_sheets.append(name)
+    finally:
+        wb.close()
+
+    if not api_sheets:
+        return None, [f"No sheet has the required columns: {', '.join(k for k, v in COL_MAP.items() if v in REQUIRED_KEYS)}"]
+    print(f"[PARSER] API sheets: {api_sheets}")
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    jobs = ([source] * len(api_sheets), api_sheets, [mode] * len(api_sheets),
+            [tracing.current_context()] * len(api_sheets))
+    if workers <= 1 or len(api_sheets) == 1:
+        results = list(map(_parse_sheet_job, *jobs))
+    else:
+        try:
+            with _parser_pool(min(workers, len(api_sheets))) as pool:
+                results = list(pool.map(_parse_sheet_job, *jobs))
+        except Exception as e:
+            print(f"[PARSER] Parallel sheet parsing failed ({e}), parsing sheets inline.")
+            results = list(map(_parse_sheet_job, *jobs))
+
+    warnings = []
+    for items, sheet_warnings, detected_base in results:
+        output["apis"].extend(items)
+        warnings.extend(sheet_warnings)
+        if detected_base and "base_url" not in output["env"]:
+            output["env"]["base_url"] = detected_base
+    return output, warnings
+
+def _parse_sheet_job(source, sheet_name: str, mode: str, trace_parent=None):
+    """
+    Parses one API sheet (runs in a pool worker), traced as a child of trace_parent.
+    Returns (items, warnings, base URL detected from absolute Endpoint URLs or None).
+    """
+    with tracing.span("parse_sheet", parent=trace_parent, sheet=sheet_name) as span:
+        items, warnings, base_url = _parse_sheet(source, sheet_name, mode)
+        span.set(rows=len(items))
+    return items, warnings, base_url
+
+def _parse_sheet(source, sheet_name: str, mode: str):
+    env, warnings = {}, []
+    if mode == "stream":
+        import openpyxl
+
+        wb = openpyxl.load_workbook(_as_file(source), read_only=True, data_only=True)
+        try:
+            rows = wb[sheet_name].iter_rows(values_only=True)
+            items = list(_iter_table_apis(rows, env, warnings, f"sheet '{sheet_name}'", module_default=sheet_name))
+        finally:
+            wb.close()
+    else:
+        import pandas as pd
+
+        df = pd.read_excel(_as_file(source), sheet_name=sheet_name, dtype=str)
+        found_map, _ = _match_columns(df.columns)
+        items, warnings = _decode_chunk(list(_normalize_frame(df, found_map, env, module_default=sheet_name)))
+    return items, [f"Sheet '{sheet_name}': {w}" for w in warnings], env.get("base_url")
+
+def _parse_xlsx_streaming(source) -> tuple[dict, list[str]]:
+    return _collect(lambda env, warnings: iter_xlsx_apis(source, env, warnings))
+
+def _as_file(source):
+    """pandas and openpyxl take a path or a file object: wrap raw bytes, pass paths through."""
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+def _open_binary(source):
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else open(source, "rb")
+
+def _source_size(source) -> int:
+    return len(source) if isinstance(source, (bytes, bytearray)) else os.path.getsize(source)
+
+def _collect(reader) -> tuple[dict, list[str]]:
+    """Drains a streaming reader, called as reader(env, warnings), into the parse_xlsx output structure."""
+    warnings = []
+    output = {
+        "apis": [],
+        "env": {},
+        "rules": {}
+    }
+    try:
+        for item in reader(output["env"], warnings):
+            output["apis"].append(item)
+    except UnicodeDecodeError as e:
+        return None, [f"Failed to read file (expected UTF-8 text): {str(e)}"]
+    except ValueError as e:
+        return None, [str(e)]
+    return output, warnings
+
+def iter_xlsx_apis(source, env: dict = None, warnings: list = None):
+    """
+    Streaming variant of parse_xlsx: yields API items one row at a time.
+
+    The workbook is opened with openpyxl in read-only mode, so cells are read row by
+    row instead of whole sheets being loaded into DataFrames. parse_xlsx(mode="stream")
+    still collects every item before returning (caching, incremental builds and both
+    emitters need the whole catalogue), so there the gain is a lower peak memory than
+    pandas, not later stages overlapping the read.
+    The 'environments' sheet is read first and merged into `env`; per-row
+    problems are appended to `warnings`.
+    Raises ValueError if the workbook cannot be read or required columns are missing.
+    """
+    import openpyxl
+
+    if env is None: env = {}
+    if warnings is None: warnings = []
+
+    print("[PARSER] Opening workbook in streaming mode...")
+    try:
+        wb = openpyxl.load_workbook(_as_file(source), read_only=True, data_only=True)
+    except Exception as e:
+        print(f"[PARSER] ERROR opening workbook: {e}")
+        raise ValueError(f"Failed to read Excel file: {str(e)}")
+
+    try:
+        target_sheet = "apis" if "apis" in wb.sheetnames else wb.sheetnames[0]
+        print(f"[PARSER] Using sheet: {target_sheet}")
+
+        if "environments" in wb.sheetnames:
+            print("[PARSER] Found 'environments' sheet, parsing variables...")
+            _read_env_rows(wb["environments"].iter_rows(values_only=True), env)
+
+        rows = wb[target_sheet].iter_rows(values_only=True)
+        yield from _iter_table_apis(rows, env, warnings, f"sheet '{target_sheet}'")
+    finally:
+        wb.close()
+
+def iter_delimited_apis(source, delimiter: str = ",", env: dict = None, warnings: list = None):
+    """
+    Streaming reader for CSV/TSV exports: the first line holds the same column
+    headers as the 'apis' sheet, every following non-blank line is one API.
+    Yields API items one row at a time, like iter_xlsx_apis().
+    """
+    import csv
+
+    if env is None: env = {}
+    if warnings is None: warnings = []
+
+    # Payload cells can be far larger than csv's 128 KB default field limit
+    csv.field_size_limit(2**31 - 1)
+    with _open_binary(source) as raw:
+        text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        rows = (tuple(r) for r in csv.reader(text, delimiter=delimiter))
+        yield from _iter_table_apis(rows, env, warnings, "file", skip_blank=True)
+
+def iter_jsonl_apis(source, env: dict = None, warnings: list = None):
+    """
+    Streaming reader for JSON Lines exports: one JSON object per line, keyed by the
+    'apis' sheet column headers. Body, params and expected response may be given as
+    JSON values instead of strings. Blank lines are skipped; "Row N" is the line number.
+    """
+    if env is None: env = {}
+    if warnings is None: warnings = []
+
+    key_maps = {}
+    with _open_binary(source) as raw:
+        text = io.TextIOWrapper(raw, encoding="utf-8-sig")
+        for row_num, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                warnings.append(f"Row {row_num}: Invalid JSON line skipped.")
+                continue
+            if not isinstance(obj, dict):
+                warnings.append(f"Row {row_num}: Expected a JSON object, line skipped.")
+                continue
+
+            # Rows from one export share their keys, so match columns once per key set
+            keys = tuple(obj.keys())
+            if keys not in key_maps:
+                found_map, missing = _match_columns(keys)
+                if missing:
+                    raise ValueError(f"Missing required columns in line {row_num}: {', '.join(missing)}")
+                key_maps[keys] = found_map
+            found_map = key_maps[keys]
+
+            def get_val(k):
+                if k not in found_map: return None
+                val = obj[found_map[k]]
+                if val is None or str(val).strip() == "": return None
+                return val
+
+            yield _build_item(get_val, row_num, env, warnings)
+
+def _iter_table_apis(rows, env, warnings, source_name, module_default="General", skip_blank=False):
+    """
+    Shared row loop of the tabular streaming readers.
+    `rows` yields tuples of cell values, the first one being the header row.
+    skip_blank drops rows whose cells are all empty (blank lines of a CSV file)
+    instead of emitting them like pandas does for blank sheet rows.
+    """
+    header = next(rows, None) or ()
+    found_map, missing = _match_columns(header)
+    if missing:
+        raise ValueError(f"Missing required columns in {source_name}: {', '.join(missing)}")
+
+    col_index = {}
+    for idx, h in enumerate(header):
+        if h is not None and h not in col_index:
+            col_index[h] = idx
+    key_index = {k: col_index[c] for k, c in found_map.items()}
+
+    # Blank rows are only emitted once a later non-blank row shows they sit
+    # inside the data (pandas drops trailing blank rows), so only the first
+    # pending blank row number and a count are kept.
+    first_blank, blank_count = None, 0
+    for row_num, values in enumerate(rows, start=2):
+        if all(v is None or str(v).strip() == "" for v in values):
+            if skip_blank:
+                continue
+            if blank_count == 0:
+                first_blank = row_num
+            blank_count += 1
+            continue
+        for blank_num in range(first_blank, first_blank + blank_count) if blank_count else ():
+            yield _build_item(lambda k: None, blank_num, env, warnings, module_default)
+        blank_count = 0
+
+        def get_val(k):
+            idx = key_index.get(k)
+            if idx is None or idx >= len(values): return None
+            val = values[idx]
+            if val is None or str(val).strip() == "": return None
+            return val
+
+        yield _build_item(get_val, row_num, env, warnings, module_default)
+
+def _read_env_rows(rows, env):
+    header = next(rows, None)
+    if not header:
+        return
+    cols = [str(c).strip().lower() for c in header]
+    key_idx = next((i for i, c in enumerate(cols) if c in ['variable', 'key', 'name']), None)
+    val_idx = next((i for i, c in enumerate(cols) if c in ['value', 'initial value', 'current value']), None)
+    if key_idx is None or val_idx is None:
+        print("[PARSER] 'environments' sheet found but could not identify Key/Value columns. Skipping.")
+        return
+    for values in rows:
+        k = values[key_idx] if key_idx < len(values) else None
+        v = values[val_idx] if val_idx < len(values) else None
+        if k is None or not str(k).strip():
+            continue
+        env[str(k).strip()] = str(v) if v is not None else ""
+
+def _norm(c):
+    """Normalizes a header cell for matching."""
+    return str(c).strip().lower().replace('\n', ' ')
+
+def _match_columns(columns):
+    """
+    Matches sheet headers against COL_MAP (exact header or internal key first, then fuzzy substring).
+    Returns (found_map: internal key -> actual header, missing required headers).
+    """
+    actual_cols = {}
+    for c in columns:
+        if c is None:
+            continue
+        actual_cols[_norm(c)] = c
 
-    # Identify actual columns
-    actual_cols = {norm(c): c for c in df.columns}
-    
-    # Check strict requirements
     missing = []
     found_map = {} # Internal Key -> Actual Column Name
-    
-    for req_key, internal_key in col_map.items():
+
+    for req_key, internal_key in COL_MAP.items():
         # Fuzzy match
         match = None
         if req_key in actual_cols:
             match = actual_cols[req_key]
+        elif internal_key in actual_cols:
+            # Exports may use the internal keys ("body", "url_params", ...) as headers
+            match = actual_cols[internal_key]
         else:
             for ac_norm, ac_orig in actual_cols.items():
-                if req_key in ac_norm or ac_norm in req_key: 
+                if req_key in ac_norm or ac_norm in req_key:
                     match = ac_orig
                     break
-        
+
         if match:
             found_map[internal_key] = match
         else:
-            if internal_key in ["name", "method", "url"]:
+            if internal_key in REQUIRED_KEYS:
                 missing.append(req_key)
 
-    if missing:
-        return None, [f"Missing required columns in sheet '{target_sheet}': {', '.join(missing)}"]
+    return found_map, missing
 
-    # Iterate rows
-    for index, row in df.iterrows():
-        row_num = index + 2
-        item = {}
-        
-        def get_val(k):
-             if k not in found_map: return None
-             val = row[found_map[k]]
-             if pd.isna(val) or str(val).strip() == "": return None
-             return val
-
-        # Basic Fields
-        item["name"] = str(get_val("name") or "Untitled").strip()
-        item["method"] = str(get_val("method") or "GET").strip().upper()
-        raw_url = str(get_val("url") or "/").strip()
-        
-        # Smart URL Logic: Check for absolute URL
-        if raw_url.lower().startswith("http"):
-            # Split into base and path
-            # Try to split after domain. Simple strategy: 3rd slash
-            parts = raw_url.split("/", 3)
-            if len(parts) >= 3:
-                # Reconstruct base: protocol//domain
-                base = f"{parts[0]}//{parts[2]}"
-                # Path is the rest
-                path_val = f"/{parts[3]}" if len(parts) > 3 else "/"
-                
-                item["url"] = path_val
-                # Store detected base url in env global if not already set or override?
-                # For now, let's just make sure we capture it. We'll prioritize the first one found.
-                if "base_url" not in output["env"]:
-                    output["env"]["base_url"] = base
-            else:
-                 # Fallback for weird urls
-                 item["url"] = raw_url
-        else:
-            item["url"] = raw_url
-        item["ref_id"] = str(get_val("ref_id") or "").strip()
-        item["module"] = str(get_val("module") or "General").strip()
-        
-        # Body
-        raw_body = get_val("body")
-        item["body"] = {}
-        item["body_mode"] = "json" # Default for new parsing
-        if raw_body:
-            try:
-                item["body"] = _parse_strict_json(raw_body)
-            except:
-                warnings.append(f"Row {row_num}: Invalid JSON in body.")
-        
-        # Headers
-        raw_headers = get_val("headers")
-        item["headers"] = _parse_headers(raw_headers)
-        
-        # Auto-detect body_mode from headers
-        # If Content-Type implies urlencoded, override default 'json'
-        ct = item["headers"].get("Content-Type", "").lower()
-        if "x-www-form-urlencoded" in ct:
-            item["body_mode"] = "urlencoded"
-
-        # Expected Response
-        raw_resp = get_val("expected_response")
-        item["expected_response"] = _safe_parse(raw_resp)
-        
-        item["status"] = 200
-        
-        # Authentication Fields
-        item["auth_scope"] = str(get_val("auth_scope") or "").strip()
-        
-        # Token Validation: If users paste the entire token into 'Token Variable', detect and fix.
-        raw_token_var = str(get_val("token_variable") or "").strip()
-        if len(raw_token_var) > 50 or "." in raw_token_var:
-             # Likely a JWT or misconfiguration
-             item["token_variable"] = "token"
+def _build_item(get_val, row_num, env, warnings, module_default="General"):
+    """
+    Builds a single API item from one sheet row.
+    get_val(internal_key) must return the raw cell value, or None for blank cells.
+    """
+    return _decode_record(_normalize_row(get_val, env, module_default), row_num, warnings)
+
+# Columns that keep their raw cell value and are JSON-decoded per cell
+JSON_KEYS = ["body", "headers", "expected_response", "url_params"]
+
+def _normalize_row(get_val, env, module_default="General"):
+    """
+    Row-at-a-time counterpart of _normalize_frame().
+    Returns a record with the plain fields already cleaned up and the raw JSON cells.
+    """
+    record = {}
+
+    def text(k, default):
+        # Only blank cells take the default: a typed 0 (openpyxl, JSONL) stays "0",
+        # as in the dtype=str frames of _normalize_frame() and in CSV
+        val = get_val(k)
+        if val is None:
+            return default
+        if isinstance(val, float) and val.is_integer():
+            val = int(val) # pandas reads whole-number cells as 1, not 1.0
+        return str(val).strip()
+
+    # Basic Fields
+    record["name"] = text("name", "Untitled")
+    record["method"] = text("method", "GET").upper()
+    raw_url = text("url", "/")
+    
+    # Smart URL Logic: Check for absolute URL
+    if raw_url.lower().startswith("http"):
+        # Split into base and path
+        # Try to split after domain. Simple strategy: 3rd slash
+        parts = raw_url.split("/", 3)
+        if len(parts) >= 3:
+            # Reconstruct base: protocol//domain
+            base = f"{parts[0]}//{parts[2]}"
+            # Path is the rest
+            path_val = f"/{parts[3]}" if len(parts) > 3 else "/"
+            
+            record["url"] = path_val
+            # Store detected base url in env global if not already set or override?
+            # For now, let's just make sure we capture it. We'll prioritize the first one found.
+            if "base_url" not in env:
+                env["base_url"] = base
         else:
-             item["token_variable"] = raw_token_var or "token" # Default to 'token' if empty
+             # Fallback for weird urls
+             record["url"] = raw_url
+    else:
+        record["url"] = raw_url
+    record["ref_id"] = text("ref_id", "")
+    record["module"] = text("module", module_default)
+    
+    # Authentication Fields
+    record["auth_scope"] = text("auth_scope", "")
+    
+    # Token Validation: If users paste the entire token into 'Token Variable', detect and fix.
+    raw_token_var = text("token_variable", "")
+    if len(raw_token_var) > 50 or "." in raw_token_var:
+         # Likely a JWT or misconfiguration
+         record["token_variable"] = "token"
+    else:
+         record["token_variable"] = raw_token_var or "token" # Default to 'token' if empty
 
-        val_gen = get_val("is_token_generator")
-        item["is_token_generator"] = str(val_gen).lower() in ['true', 'yes', '1'] if val_gen else False
-        
-        # URL Params (for form-urlencoded or query params)
-        raw_url_params = get_val("url_params")
-        item["params"] = {} # Use standard key expected by generator
-        if raw_url_params:
-            try:
-                item["params"] = _parse_strict_json(raw_url_params)
-                # If body is empty but params exist, use params as body for form-urlencoded
-                # BUT only if it's meant to be a body. For GET, it should stay as params.
-                
-                # Logic: If method is not GET and content-type is urlencoded, assume body.
-                content_type = item["headers"].get("Content-Type", "").lower()
-                is_urlencoded = "form-urlencoded" in content_type
-                
-                if not item["body"] and is_urlencoded and item["method"] != "GET":
-                     item["body"] = item["params"]
-                     item["body_mode"] = "urlencoded"
-            except:
-                warnings.append(f"Row {row_num}: Invalid JSON in URL Params.")
-        
-        output["apis"].append(item)
+    val_gen = get_val("is_token_generator")
+    record["is_token_generator"] = str(val_gen).lower() in ['true', 'yes', '1'] if val_gen else False
 
-    return output, warnings
+    for k in JSON_KEYS:
+        record[k] = get_val(k)
+    return record
+
+def _normalize_frame(df, found_map, env, module_default="General"):
+    """
+    Vectorized normalization of a whole sheet read with dtype=str.
+    One pass per column does the trimming, blank handling, method upper-casing,
+    absolute URL splitting and token field clean-up that _normalize_row() does per cell.
+    Yields (row_num, record) in sheet order.
+    """
+    import pandas as pd
+
+    n = len(df)
+    cleaned = {}
+
+    def column(k):
+        # (raw cell values, trimmed values); blank cells are None in both (mirrors get_val)
+        if k not in cleaned:
+            if k not in found_map:
+                empty = pd.Series([None] * n, index=df.index, dtype=object)
+                cleaned[k] = (empty, empty)
+            else:
+                col = df[found_map[k]].astype(object)
+                trimmed = col.str.strip()
+                present = col.notna() & (trimmed != "")
+                cleaned[k] = (col.where(present, None), trimmed.where(present, None))
+        return cleaned[k]
+
+    def raw(k):
+        return column(k)[0]
+
+    def stripped(k, default):
+        trimmed = column(k)[1]
+        return trimmed.where(trimmed.notna(), default)
+
+    name = stripped("name", "Untitled")
+    method = stripped("method", "GET").str.upper()
+    url = stripped("url", "/")
+    ref_id = stripped("ref_id", "")
+    module = stripped("module", module_default)
+    auth_scope = stripped("auth_scope", "")
+
+    # Smart URL Logic: absolute URLs are split into base (protocol//domain) and path
+    parts = url.str.split("/", n=3, expand=True).reindex(columns=range(4)).astype(object)
+    is_split = url.str.lower().str.startswith("http") & parts[2].notna()
+    base = parts[0] + "//" + parts[2].fillna("")
+    path_val = ("/" + parts[3].fillna("")).where(parts[3].notna(), "/")
+    url = path_val.where(is_split, url)
+    if "base_url" not in env and is_split.any():
+        env["base_url"] = base[is_split].iloc[0]
+
+    # Token Validation: a pasted JWT / dotted value falls back to 'token'
+    token_var = stripped("token_variable", "")
+    bad_token = (token_var.str.len() > 50) | token_var.str.contains(".", regex=False) | (token_var == "")
+    token_var = token_var.where(~bad_token, "token")
+
+    val_gen = raw("is_token_generator")
+    is_token_gen = val_gen.astype(str).str.lower().isin(['true', 'yes', '1']) & val_gen.notna()
+
+    columns = {
+        "name": name,
+        "method": method,
+        "url": url,
+        "ref_id": ref_id,
+        "module": module,
+        "auth_scope": auth_scope,
+        "token_variable": token_var,
+        "is_token_generator": is_token_gen,
+    }
+    for k in JSON_KEYS:
+        columns[k] = raw(k)
+
+    keys = list(columns.keys())
+    values = [columns[k].tolist() for k in keys]
+    for index, row in zip(df.index, zip(*values)):
+        yield index + 2, dict(zip(keys, row))
+
+def _decode_record(record, row_num, warnings):
+    """
+    Turns a normalized record into the API item, decoding the JSON cells.
+    Invalid JSON is reported in `warnings` as "Row N: ...".
+    """
+    item = {}
+    item["name"] = record["name"]
+    item["method"] = record["method"]
+    item["url"] = record["url"]
+    item["ref_id"] = record["ref_id"]
+    item["module"] = record["module"]
+
+    # Body
+    raw_body = record["body"]
+    item["body"] = {}
+    item["body_mode"] = "json" # Default for new parsing
+    if raw_body:
+        try:
+            item["body"] = _parse_strict_json(raw_body)
+        except:
+            warnings.append(f"Row {row_num}: Invalid JSON in body.")
+    
+    # Headers
+    raw_headers = record["headers"]
+    item["headers"] = _parse_headers(raw_headers)
+    
+    # Auto-detect body_mode from headers
+    # If Content-Type implies urlencoded, override default 'json'
+    ct = item["headers"].get("Content-Type", "").lower()
+    if "x-www-form-urlencoded" in ct:
+        item["body_mode"] = "urlencoded"
+
+    # Expected Response
+    raw_resp = record["expected_response"]
+    item["expected_response"] = _safe_parse(raw_resp)
+    
+    item["status"] = 200
+    
+    item["auth_scope"] = record["auth_scope"]
+    item["token_variable"] = record["token_variable"]
+    item["is_token_generator"] = bool(record["is_token_generator"])
+    
+    # URL Params (for form-urlencoded or query params)
+    raw_url_params = record["url_params"]
+    item["params"] = {} # Use standard key expected by generator
+    if raw_url_params:
+        try:
+            item["params"] = _parse_strict_json(raw_url_params)
+            # If body is empty but params exist, use params as body for form-urlencoded
+            # BUT only if it's meant to be a body. For GET, it should stay as params.
+            
+            # Logic: If method is not GET and content-type is urlencoded, assume body.
+            content_type = item["headers"].get("Content-Type", "").lower()
+            is_urlencoded = "form-urlencoded" in content_type
+            
+            if not item["body"] and is_urlencoded and item["method"] != "GET":
+                 item["body"] = item["params"]
+                 item["body_mode"] = "urlencoded"
+        except:
+            warnings.append(f"Row {row_num}: Invalid JSON in URL Params.")
+    
+    return item
+
+def _decode_records(records, workers=None):
+    """
+    Decodes a list of (row_num, record) pairs into API items.
+    Large sheets are split into contiguous chunks decoded on a process pool; chunks are
+    merged back in sheet order so items and "Row N: ..." warnings keep their order.
+    Returns (items, warnings).
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(records) < PARALLEL_DECODE_MIN_ROWS:
+        with tracing.span("decode_json", rows=len(records), chunks=1):
+            return _decode_chunk(records)
+
+    chunk_size = max(DECODE_CHUNK_MIN_ROWS, -(-len(records) // (workers * 4)))
+    chunks = [records[i:i + chunk_size] for i in range(0, len(records), chunk_size)]
+    print(f"[PARSER] Decoding {len(records)} rows in {len(chunks)} chunks on {workers} workers...")
+
+    try:
+        with tracing.span("decode_json", rows=len(records), chunks=len(chunks), workers=workers):
+            parent = tracing.current_context()
+            with _parser_pool(workers) as pool:
+                results = list(pool.map(_decode_chunk_job, chunks, range(len(chunks)), [parent] * len(chunks)))
+    except Exception as e:
+        # Broken pool (e.g. worker killed) - fall back to decoding inline
+        print(f"[PARSER] Parallel decoding failed ({e}), decoding inline.")
+        return _decode_chunk(records)
+
+    items, warnings = [], []
+    for chunk_items, chunk_warnings in results:
+        items.extend(chunk_items)
+        warnings.extend(chunk_warnings)
+    return items, warnings
+
+def _decode_chunk_job(records, index: int, trace_parent=None):
+    """Decodes one chunk (runs in a pool worker), traced as a child of trace_parent."""
+    with tracing.span("decode_chunk", parent=trace_parent, chunk=index, rows=len(records)):
+        return _decode_chunk(records)
+
+def _decode_chunk(records):
+    warnings = []
+    items = [_decode_record(record, row_num, warnings) for row_num, record in records]
+    return items, warnings
+
+@contextmanager
+def _parser_pool(workers):
+    """
+    A process pool for one parse. It is shut down, its threads and worker processes
+    joined, before the parse returns: job workers fork once parsing is done (see
+    job_executor.ForkedCall), and a pool thread alive at that point could hold a lock
+    the child would inherit locked. The pool's own workers are spawned for the same
+    reason: with JOB_EXECUTOR=thread parses run on threads of the server process.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        yield pool
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
 
 def _parse_strict_json(value):
     if isinstance(value, (dict, list)): return value
@@ -221,6 +738,7 @@ def _safe_parse(value):
 
 def _parse_headers(value):
     if not value: return {}
+    if isinstance(value, dict): return value
     try:
         return json.loads(str(value))
     except:
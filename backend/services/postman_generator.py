@@ -1,12 +1,18 @@
 import json
 import urllib.parse
+from . import tracing
 
-def generate_postman_collection(api_data, collection_name="Generated Collection") -> dict:
+@tracing.traced("generate_postman_collection")
+def generate_postman_collection(api_data, collection_name="Generated Collection", row_cache=None,
+                                cancel_check=None) -> dict:
     """
     Generates a Postman Collection v2.1 JSON from parsed API data.
     api_data can be either:
     - A dict with {"apis": [...], "env": {}, "rules": {}}
     - Or a list of API dicts directly (legacy)
+    row_cache (services.incremental.RowCache) lets unchanged rows reuse the
+    request items of a previous build.
+    cancel_check, if given, is called before each row and may raise to abort the build.
     """
     
     # Handle both dict format and list format
@@ -16,6 +22,7 @@ def generate_postman_collection(api_data, collection_name="Generated Collection"
         apis = api_data
     else:
         apis = []
+    tracing.set_attributes(rows=len(apis))
     
     collection_id = str(hash(collection_name)) # Simple ID generation
     
@@ -53,7 +60,15 @@ def generate_postman_collection(api_data, collection_name="Generated Collection"
     folder_map = {}
     
     for api in apis:
-        request_item = _create_postman_request(api, base_url_variable)
+        if cancel_check:
+            cancel_check()
+        context = {"base_url_variable": base_url_variable}
+        request_item = row_cache.get("postman", api, context) if row_cache else None
+        if request_item is None:
+            request_item = _create_postman_request(api, base_url_variable)
+        else:
+            # Keep the side effects of a fresh build on the shared row
+            _apply_default_headers(api)
         module = api.get("module", "General")
         
         if module not in folder_map:
@@ -61,6 +76,8 @@ def generate_postman_collection(api_data, collection_name="Generated Collection"
                 "name": module,
                 "item": []
             }
+        if row_cache:
+            row_cache.put("postman", api, context, {"folder": module, "index": len(folder_map[module]["item"])})
         folder_map[module]["item"].append(request_item)
         
     # Convert folder map to list
@@ -69,6 +86,24 @@ def generate_postman_collection(api_data, collection_name="Generated Collection"
 
     return collection
 
+def apply_default_headers(apis):
+    """
+    Applies the header defaults of a Postman build to every row up front, in place.
+    Generators running alongside generate_postman_collection() then see the rows as
+    they would after it.
+    """
+    for api in apis:
+        _apply_default_headers(api)
+
+def _apply_default_headers(api):
+    """
+    Defaults Content-Type to JSON for rows with a body.
+    Note: updates the row's headers in place, later generators see the header too.
+    """
+    headers = api.get("headers", {})
+    if api.get("body", {}) and "Content-Type" not in headers:
+         headers["Content-Type"] = "application/json"
+
 def _create_postman_request(api, base_url_variable="basic url"):
     """
     Creates a single Postman request item.
@@ -135,8 +170,7 @@ def _create_postman_request(api, base_url_variable="basic url"):
     }
 
     # 2. Headers Handler
-    if body and "Content-Type" not in headers:
-         headers["Content-Type"] = "application/json"
+    _apply_default_headers(api)
 
     # Apply Collection Auth if requested
     if str(auth_scope).lower() == "collection":
@@ -0,0 +1,91 @@
+import cProfile
+import os
+import pstats
+import threading
+from pathlib import Path
+
+PROFILE_FILENAME = "profile.pstats"
+COLLAPSED_FILENAME = "profile_collapsed.txt"
+
+# Call paths carrying less than this share of the total time are left out of the stacks
+MIN_STACK_SHARE = 1e-4
+
+def _stage_marker(stage: str):
+    """A pass-through function named `stage:<stage>`, the root of the stage's calls in the profile."""
+    def marker(fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+    marker.__code__ = marker.__code__.replace(co_name=f"stage:{stage}")
+    return marker
+
+class TaskProfiler:
+    """
+    cProfile capture of a job, stage by stage. stage() runs a function under a
+    profiler of its own (cProfile only sees the thread that enabled it, and stages
+    run on different threads) below a `stage:<name>` marker function. save() merges
+    the stages into one pstats file and a collapsed-stack file for flame graphs.
+    """
+
+    def __init__(self):
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def stage(self, name: str, fn, *args, **kwargs):
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(_stage_marker(name), fn, *args, **kwargs)
+        finally:
+            with self._lock:
+                self._profiles.append(profile)
+
+    def save(self, directory) -> Path:
+        """Writes PROFILE_FILENAME and COLLAPSED_FILENAME to `directory`; returns the pstats path."""
+        with self._lock:
+            stats = pstats.Stats(*self._profiles)
+        directory = Path(directory)
+        path = directory / PROFILE_FILENAME
+        stats.dump_stats(path)
+        with open(directory / COLLAPSED_FILENAME, "w", encoding="utf-8") as f:
+            for stack, seconds in sorted(collapsed_stacks(stats).items()):
+                micros = round(seconds * 1e6)
+                if micros:
+                    f.write(f"{stack} {micros}\n")
+        return path
+
+def _frame_label(func) -> str:
+    filename, line, name = func
+    label = name if filename == "~" else f"{name} ({os.path.basename(filename)}:{line})"
+    return label.replace(";", ":")
+
+def collapsed_stacks(stats: pstats.Stats) -> dict:
+    """
+    Self time in seconds per call stack ("root;caller;callee"), from a profile.
+
+    cProfile records caller-callee pairs, not whole stacks, so this is an estimate:
+    the time of a function called along several paths is split between them in
+    proportion to the time each caller spent in it. Recursive calls are cut at the
+    first repeated function.
+    """
+    entries = stats.stats
+    callees = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    total = sum(entry[2] for entry in entries.values())
+    min_seconds = total * MIN_STACK_SHARE
+
+    stacks = {}
+    # (function, labels of the path to it, share of the function's time on this path)
+    pending = [(func, (_frame_label(func),), 1.0) for func, entry in entries.items() if not entry[4]]
+    while pending:
+        func, path, share = pending.pop()
+        self_time = entries[func][2]
+        if self_time * share:
+            stack = ";".join(path)
+            stacks[stack] = stacks.get(stack, 0.0) + self_time * share
+        for callee, edge_time in callees.get(func, ()):
+            callee_cumulative = entries[callee][3]
+            label = _frame_label(callee)
+            if callee_cumulative <= 0 or edge_time * share < min_seconds or label in path:
+                continue
+            pending.append((callee, path + (label,), share * edge_time / callee_cumulative))
+    return stacks
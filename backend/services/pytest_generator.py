@@ -1,16 +1,41 @@
-import os
 import shutil
+import time
 import zipfile
 import json
 from pathlib import Path
 from .report_template import HTML_REPORT_TEMPLATE
-
-def generate_pytest_project(api_data, output_dir: str):
+from . import tracing
+from .blob_store import blob_digest
+
+# zlib level for the project zip: 1 is fastest, 9 smallest, 6 is zlib's default
+DEFAULT_COMPRESSLEVEL = 6
+# Written instead of the zip when generate_pytest_project() is given a blob store
+PROJECT_SOURCES_FILENAME = "pytest_project.json"
+
+@tracing.traced("generate_pytest_project")
+def generate_pytest_project(api_data, output_dir: str, row_cache=None, cancel_check=None, extract: bool = False,
+                            compresslevel: int = DEFAULT_COMPRESSLEVEL, blob_store=None, blob_owner: str = None,
+                            timings: dict = None):
     """
-    Generates a Pytest project structure from API data.
+    Generates a Pytest project from API data and returns the path of
+    `<output_dir>/pytest_tests.zip`.
     api_data can be either:
     - A dict with {"apis": [...], "env": {}, "rules": {}}
     - Or a list of API dicts directly (legacy)
+    The project files are assembled in memory and written straight into the zip
+    (ZIP_DEFLATED at `compresslevel`); with extract=True they are also written to
+    `<output_dir>/pytest_tests/` (e.g. to run the tests right away).
+    row_cache (services.incremental.RowCache) lets unchanged rows reuse the
+    test files of a previous build, read back from its zip.
+    cancel_check, if given, is called before each row and before zipping, and may
+    raise to abort the build.
+    With a blob_store (services.blob_store.BlobStore) no zip is written: the files
+    are stored as blobs referenced by `blob_owner` (the task id), and the path of
+    `<output_dir>/pytest_project.json`, which maps each file to its blob, is returned.
+    The row cache then records blob digests instead of zip paths, so unchanged rows
+    are neither rendered nor stored again. load_project_files() and stream_zip() turn
+    the project back into the zip.
+    timings, if given, receives the seconds spent writing the zip under "zip".
     """
     
     # Handle both dict format and list format
@@ -20,15 +45,19 @@ def generate_pytest_project(api_data, output_dir: str):
         apis = api_data
     else:
         apis = []
+    tracing.set_attributes(rows=len(apis), storage="blobs" if blob_store is not None else "zip")
     
-    base_dir = Path(output_dir)
-    tests_dir = base_dir / "pytest_tests"
-    if tests_dir.exists():
-        shutil.rmtree(tests_dir)
-    tests_dir.mkdir(parents=True)
-    
+    # Project files by path inside the project; a later file with the same path replaces
+    # the earlier one, as writing them to disk one after the other would
+    files = {}
+    # With a blob store: path -> blob digest; known up front for rows reused from the row
+    # cache (their files entry is None), for the other files once they are stored
+    file_blobs = {}
+    # Row of each file reused as a blob digest, to render it after all if the blob is gone
+    reused_rows = {}
+
     # Generate requirements.txt
-    _create_file(tests_dir / "requirements.txt", "pytest\nrequests\n")
+    files["requirements.txt"] = "pytest\nrequests\n"
     
     # Extract env from api_data
     env = {}
@@ -36,7 +65,11 @@ def generate_pytest_project(api_data, output_dir: str):
         env = api_data.get("env", {})
     
     # Generate conftest.py
-    _create_conftest(tests_dir, apis, env)
+    # The token API's fixture and test file send a default User-Agent. It is added to a copy
+    # of the row, so the shared parsed rows stay as the Postman generator expects them.
+    token_api = next((api for api in apis if api.get("is_token_generator")), None)
+    token_row = _with_default_user_agent(token_api) if token_api else None
+    files["conftest.py"] = _render_conftest(token_row, env)
 
     # Generate report_template.py
     import base64
@@ -44,7 +77,7 @@ def generate_pytest_project(api_data, output_dir: str):
     rt_content = f'''import base64
 HTML_TEMPLATE = base64.b64decode("{b64_template}").decode("utf-8")
 '''
-    _create_file(tests_dir / "report_template.py", rt_content)
+    files["report_template.py"] = rt_content
     
     # Group APIs (logic: try to group by first path segment, or 'general')
     groups = {}
@@ -61,28 +94,79 @@ HTML_TEMPLATE = base64.b64decode("{b64_template}").decode("utf-8")
         
     # Generate Test Files
     for group, apis in groups.items():
-        group_dir = tests_dir / f"test_{group}"
-        group_dir.mkdir(exist_ok=True)
         # Create __init__.py for the package
-        _create_file(group_dir / "__init__.py", "")
+        files[f"test_{group}/__init__.py"] = ""
         
         for api in apis:
-            _create_test_file(group_dir, api)
+            if cancel_check:
+                cancel_check()
+            context = {"token_api": api is token_api}
+            if blob_store is not None:
+                # Rows cached as blob digests are only reused by builds that store blobs too
+                context["blob"] = True
+            cached = row_cache.get("pytest", api, context) if row_cache else None
+            if cached is None:
+                filename, code = _render_test_file(token_row if api is token_api else api)
+                files[f"test_{group}/{filename}"] = code
+                digest = blob_digest(code.encode("utf-8")) if blob_store is not None else None
+            elif blob_store is not None:
+                filename, digest = cached
+                files[f"test_{group}/{filename}"] = None
+                file_blobs[f"test_{group}/{filename}"] = digest
+                reused_rows[f"test_{group}/{filename}"] = token_row if api is token_api else api
+            else:
+                filename, code = cached
+                files[f"test_{group}/{filename}"] = code
+            if row_cache:
+                # Where the file ends up: its blob, or its path in the zip
+                ref = {"file": filename, "path": f"test_{group}/{filename}"}
+                if blob_store is not None:
+                    ref = {"file": filename, "blob": digest}
+                row_cache.put("pytest", api, context, ref)
             
-    # Zip the directory
+    if cancel_check:
+        cancel_check()
+    base_dir = Path(output_dir)
+    base_dir.mkdir(parents=True, exist_ok=True)
+    if blob_store is not None:
+        rendered = [arcname for arcname, content in files.items() if content is not None]
+        with tracing.span("store_blobs", files=len(files), rendered=len(rendered)):
+            digests, missing = blob_store.put_many(blob_owner, [files[arcname].encode("utf-8") for arcname in rendered],
+                                                   existing={file_blobs[arcname] for arcname, content in files.items()
+                                                             if content is None})
+            file_blobs.update(zip(rendered, digests))
+            if missing:
+                # Blobs released since the parent task was built (e.g. retention deleted every
+                # task using them): render those files again, as a cache miss
+                again = [arcname for arcname, content in files.items()
+                         if content is None and file_blobs[arcname] in missing]
+                for arcname in again:
+                    files[arcname] = _render_test_file(reused_rows[arcname])[1]
+                digests, _ = blob_store.put_many(blob_owner, [files[arcname].encode("utf-8") for arcname in again])
+                file_blobs.update(zip(again, digests))
+                if row_cache:
+                    row_cache.miss("pytest", len(again))
+            sources_path = base_dir / PROJECT_SOURCES_FILENAME
+            with open(sources_path, "w", encoding="utf-8") as f:
+                json.dump({"files": [{"path": arcname, "blob": file_blobs[arcname]} for arcname in files]}, f)
+        return str(sources_path)
     zip_path = base_dir / "pytest_tests.zip"
-    _zip_directory(tests_dir, zip_path)
+    zip_start = time.perf_counter()
+    _write_zip(files, zip_path, compresslevel)
+    if timings is not None:
+        timings["zip"] = time.perf_counter() - zip_start
+    if extract:
+        _write_tree(files, base_dir / "pytest_tests")
     
     return str(zip_path)
 
-def _create_file(path, content):
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(content)
+def _with_default_user_agent(api):
+    headers = dict(api.get("headers", {}))
+    if "User-Agent" not in headers:
+        headers["User-Agent"] = "API-Factory-Test-Client/1.0"
+    return dict(api, headers=headers)
 
-def _create_conftest(base_path, apis, env={}):
-    # Find Token Generator API
-    token_api = next((api for api in apis if api.get("is_token_generator")), None)
-    
+def _render_conftest(token_api=None, env={}):
     # Determine default base url
     default_base_url = env.get("base_url", "http://localhost:8000")
     
@@ -200,10 +284,6 @@ def auth_token(base_url):
         url = token_api.get("url", "")
         method = token_api.get("method", "POST").lower()
         headers = token_api.get("headers", {})
-        # Ensure User-Agent is present
-        if "User-Agent" not in headers:
-            headers["User-Agent"] = "API-Factory-Test-Client/1.0"
-            
         body = token_api.get("body", {})
         url_params = token_api.get("url_params", {})
         token_var = token_api.get("token_variable", "token")
@@ -321,10 +401,9 @@ def api_client(base_url, auth_token, request):
 
     return ApiClient()
 """
-    
-    _create_file(base_path / "conftest.py", content)
+    return content
 
-def _create_test_file(directory, api):
+def _render_test_file(api):
     clean_name = api.get("name", "untitled").lower().replace(" ", "_").replace("-", "_")
     filename = f"test_{clean_name}.py"
     
@@ -499,15 +578,76 @@ def _create_test_file(directory, api):
     code += "    import sys\n"
     code += "    sys.exit(pytest.main([\"-v\", \"-s\", __file__]))\n"
 
-    _create_file(directory / filename, code)
+    return filename, code
 
-def _zip_directory(folder_path, output_path):
-    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, _, files in os.walk(folder_path):
-            for file in files:
-                file_path = Path(root) / file
-                arcname = file_path.relative_to(folder_path)
-                zipf.write(file_path, arcname)
+def load_project_files(sources_path, blob_store) -> dict:
+    """
+    The project files (path -> content) of a pytest_project.json, read from
+    `blob_store`. Raises FileNotFoundError if the file or one of its blobs is gone.
+    """
+    sources_path = Path(sources_path)
+    with open(sources_path, "r", encoding="utf-8") as f:
+        entries = json.load(f)["files"]
+    files = {}
+    for entry in entries:
+        if "blob" not in entry:
+            raise FileNotFoundError(f"{sources_path} lists {entry.get('path')!r} without a blob")
+        files[entry["path"]] = blob_store.get(entry["blob"]).decode("utf-8")
+    return files
+
+class _ZipSink:
+    """Write-only, unseekable file object for ZipFile; the written bytes are collected with take()."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def stream_zip(files, compresslevel=DEFAULT_COMPRESSLEVEL):
+    """
+    Yields the zip of `files` (path -> content) piece by piece, one file at a time,
+    without writing it anywhere. The entries are the same as _write_zip's; sizes and
+    CRCs follow each entry's data (the output cannot seek back to fill them in).
+    """
+    sink = _ZipSink()
+    date_time = time.localtime()[:6]
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as zipf:
+        for arcname, content in files.items():
+            zipf.writestr(_zip_info(arcname, date_time), content.encode("utf-8"), compresslevel=compresslevel)
+            yield sink.take()
+    yield sink.take() # central directory
+
+def _zip_info(arcname, date_time):
+    info = zipfile.ZipInfo(arcname, date_time=date_time)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = 0o644 << 16 # rw-r--r--, as extracted files get by default
+    return info
+
+def _write_zip(files, output_path, compresslevel=DEFAULT_COMPRESSLEVEL):
+    date_time = time.localtime()[:6]
+    with tracing.span("write_zip", files=len(files), compresslevel=compresslevel) as span:
+        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as zipf:
+            for arcname, content in files.items():
+                zipf.writestr(_zip_info(arcname, date_time), content.encode("utf-8"), compresslevel=compresslevel)
+        span.set(bytes=Path(output_path).stat().st_size)
+
+def _write_tree(files, tests_dir):
+    if tests_dir.exists():
+        shutil.rmtree(tests_dir)
+    for arcname, content in files.items():
+        path = tests_dir / arcname
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _create_file(path, content)
 
 def _create_file(path, content):
     with open(path, "w", encoding="utf-8") as f:
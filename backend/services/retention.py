@@ -0,0 +1,237 @@
+import os
+import re
+import shutil
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None # Windows: concurrent sweeps from several workers are not prevented
+
+# Tasks in these states are never evicted, nor is anything their artifacts depend on
+ACTIVE_STATUSES = ("pending", "processing")
+# Only task directories are swept; templates and index files in artifacts_storage are left alone
+TASK_DIR_PATTERN = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+# Uploads are written before their task record exists, so recent files are never treated as leftovers
+UPLOAD_GRACE_SECONDS = 3600
+
+class RetentionPolicy:
+    """Limits applied by a sweep. A value of 0 disables that limit."""
+
+    def __init__(self, ttl_seconds: float = 0, max_bytes: int = 0, max_tasks: int = 0):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.max_tasks = max_tasks
+
+    def to_dict(self) -> dict:
+        return {"ttl_seconds": self.ttl_seconds, "max_bytes": self.max_bytes, "max_tasks": self.max_tasks}
+
+def directory_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def sweep(store, artifacts_dir: Path, policy: RetentionPolicy, cache=None, blobs=None, now: float = None) -> dict:
+    """
+    Evicts tasks past the TTL, then the least recently downloaded tasks until the
+    artifact bytes and the task count fit the policy.
+
+    Cache hits share the directory of the task that generated their artifacts, so a
+    directory and every task pointing at it are evicted together, ranked by the most
+    recent access of any of them. Groups with a pending or processing task are kept.
+    Task directories with no task record (e.g. left by an older tasks.json) are
+    ranked by their modification time. Evicting a directory releases its task's
+    references in the blob store (`blobs`), whose stored bytes count towards
+    max_bytes. Evicted tasks lose their trace (`traces/<task_id>.jsonl`) too, and
+    traces of tasks that no longer exist are swept like stale uploads. Returns a
+    report of what was reclaimed.
+    """
+    artifacts_dir = Path(artifacts_dir)
+    now = time.time() if now is None else now
+    start = time.perf_counter()
+
+    # Group tasks by the directory that holds their artifacts
+    groups = {}
+    tasks = store.list_tasks()
+    for task in tasks:
+        owner = task["cache_source"] or task["task_id"]
+        group = groups.setdefault(owner, {"members": [], "active": False, "last_access": 0.0})
+        group["members"].append(task["task_id"])
+        group["active"] = group["active"] or task["status"] in ACTIVE_STATUSES
+        group["last_access"] = max(group["last_access"], task["last_accessed_at"])
+    if artifacts_dir.exists():
+        for entry in os.scandir(artifacts_dir):
+            if entry.is_dir() and TASK_DIR_PATTERN.match(entry.name) and entry.name not in groups:
+                groups[entry.name] = {"members": [], "active": False, "last_access": entry.stat().st_mtime}
+    for owner, group in groups.items():
+        task_dir = artifacts_dir / owner
+        group["bytes"] = directory_size(task_dir) if task_dir.is_dir() else 0
+
+    report = {
+        "evicted_tasks": 0,
+        "evicted_directories": 0,
+        "reclaimed_bytes": 0,
+        "reasons": {"ttl": 0, "max_bytes": 0, "max_tasks": 0, "stale_upload": 0, "stale_trace": 0},
+    }
+    total_bytes = sum(g["bytes"] for g in groups.values()) + (blobs.stored_bytes() if blobs is not None else 0)
+    total_tasks = len(tasks)
+
+    def evict(owner, reason):
+        nonlocal total_bytes, total_tasks
+        group = groups.pop(owner)
+        # Drop the records first so no new download starts on files about to disappear
+        for task_id in group["members"]:
+            store.delete(task_id)
+            try:
+                os.remove(artifacts_dir / "traces" / f"{task_id}.jsonl")
+            except OSError:
+                pass
+        if cache is not None:
+            cache.drop_task(owner)
+        shutil.rmtree(artifacts_dir / owner, ignore_errors=True)
+        # Blobs only the evicted task used are deleted; shared ones stay
+        reclaimed = group["bytes"] + (blobs.release(owner) if blobs is not None else 0)
+        total_bytes -= reclaimed
+        total_tasks -= len(group["members"])
+        report["evicted_tasks"] += len(group["members"])
+        report["evicted_directories"] += 1
+        report["reclaimed_bytes"] += reclaimed
+        report["reasons"][reason] += 1
+
+    candidates = sorted((owner for owner, g in groups.items() if not g["active"]),
+                        key=lambda owner: groups[owner]["last_access"])
+    for owner in candidates:
+        if policy.ttl_seconds and now - groups[owner]["last_access"] > policy.ttl_seconds:
+            evict(owner, "ttl")
+    for owner in candidates:
+        if owner not in groups:
+            continue
+        if policy.max_bytes and total_bytes > policy.max_bytes:
+            evict(owner, "max_bytes")
+        elif policy.max_tasks and total_tasks > policy.max_tasks:
+            evict(owner, "max_tasks")
+
+    # Uploads normally disappear after parsing; leftovers of interrupted tasks are swept here
+    uploads_dir = artifacts_dir / "uploads"
+    active = {t["task_id"] for t in tasks if t["status"] in ACTIVE_STATUSES}
+    if uploads_dir.exists():
+        for entry in os.scandir(uploads_dir):
+            if entry.is_file() and os.path.splitext(entry.name)[0] not in active:
+                try:
+                    st = entry.stat()
+                    if now - st.st_mtime < UPLOAD_GRACE_SECONDS:
+                        continue
+                    size = st.st_size
+                    os.remove(entry.path)
+                except OSError:
+                    continue
+                report["reclaimed_bytes"] += size
+                report["reasons"]["stale_upload"] += 1
+
+    # Traces of uploads that never became a task (rejected, aborted) or of deleted tasks
+    traces_dir = artifacts_dir / "traces"
+    known = {t["task_id"] for t in tasks}
+    if traces_dir.exists():
+        for entry in os.scandir(traces_dir):
+            if entry.is_file() and os.path.splitext(entry.name)[0] not in known:
+                try:
+                    if now - entry.stat().st_mtime < UPLOAD_GRACE_SECONDS:
+                        continue
+                    os.remove(entry.path)
+                except OSError:
+                    continue
+                report["reasons"]["stale_trace"] += 1
+
+    report["remaining_tasks"] = total_tasks
+    report["remaining_bytes"] = total_bytes
+    report["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    report["finished_at"] = time.time()
+    return report
+
+class RetentionSweeper:
+    """
+    Runs sweep() at startup and then every `interval` seconds on a daemon thread. With several server
+    workers, a non-blocking lock on `<artifacts_dir>/retention.lock` lets only one
+    of them sweep at a time; the others skip that round.
+    """
+
+    def __init__(self, store_factory, artifacts_dir: Path, policy: RetentionPolicy, interval: float,
+                 cache_factory=None, blobs_factory=None):
+        self.store_factory = store_factory
+        self.cache_factory = cache_factory
+        self.blobs_factory = blobs_factory
+        self.artifacts_dir = Path(artifacts_dir)
+        self.policy = policy
+        self.interval = interval
+        self.last_report = None
+        self.total_reclaimed_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.policy.ttl_seconds or self.policy.max_bytes or self.policy.max_tasks)
+
+    def start(self):
+        if not self.enabled or self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="retention-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        # First sweep right away, so a restart after a long downtime cleans up immediately
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Retention sweep failed: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def run_once(self) -> dict:
+        """Sweeps now. Returns the report, or None if another worker is sweeping."""
+        with self._lock:
+            if fcntl is None:
+                report = self._sweep()
+            else:
+                with open(self.artifacts_dir / "retention.lock", "a") as lock_file:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        return None
+                    try:
+                        report = self._sweep()
+                    finally:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+            self.last_report = report
+            self.total_reclaimed_bytes += report["reclaimed_bytes"]
+            if report["evicted_tasks"] or report["evicted_directories"] or report["reasons"]["stale_upload"]:
+                print(f"Retention sweep: evicted {report['evicted_tasks']} tasks "
+                      f"({report['evicted_directories']} directories), reclaimed {report['reclaimed_bytes']} bytes "
+                      f"in {report['duration_ms']} ms")
+            return report
+
+    def _sweep(self) -> dict:
+        cache = self.cache_factory() if self.cache_factory else None
+        blobs = self.blobs_factory() if self.blobs_factory else None
+        return sweep(self.store_factory(), self.artifacts_dir, self.policy, cache=cache, blobs=blobs)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "policy": self.policy.to_dict(),
+            "interval_seconds": self.interval,
+            "total_reclaimed_bytes": self.total_reclaimed_bytes,
+            "last_report": self.last_report
+        }
@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+def format_sse(event: str, data: dict, event_id: int = None) -> str:
+    """One Server-Sent Events message."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+class TaskEventHub:
+    """
+    Wakes event-stream subscribers when the task they watch changes.
+
+    Changes made in this process arrive through the task store listener (notify())
+    and wake subscribers immediately. Changes made by other worker processes are
+    picked up by one poller per process that reads each watched task's progress once
+    per `poll_interval`, however many streams watch it.
+    """
+
+    def __init__(self, store_factory, poll_interval: float = 0.5):
+        self.store_factory = store_factory
+        self.poll_interval = poll_interval
+        self._subscribers = {} # task_id -> set of asyncio.Event
+        self._last_seen = {} # task_id -> progress seen by the poller
+        self._loop = None
+        self._poller = None
+
+    def notify(self, task_id: str):
+        """Store listener; may be called from any thread."""
+        loop = self._loop
+        if loop is not None and task_id in self._subscribers:
+            loop.call_soon_threadsafe(self._wake, task_id)
+
+    def _wake(self, task_id: str):
+        for event in self._subscribers.get(task_id, ()):
+            event.set()
+
+    def subscribe(self, task_id: str) -> asyncio.Event:
+        """Returns an event that is set whenever the task may have changed. Call from the event loop."""
+        self._loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        self._subscribers.setdefault(task_id, set()).add(event)
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+        return event
+
+    def unsubscribe(self, task_id: str, event: asyncio.Event):
+        watchers = self._subscribers.get(task_id)
+        if watchers is None:
+            return
+        watchers.discard(event)
+        if not watchers:
+            del self._subscribers[task_id]
+            self._last_seen.pop(task_id, None)
+
+    def subscriber_count(self) -> int:
+        return sum(len(w) for w in self._subscribers.values())
+
+    async def _poll(self):
+        while self._subscribers:
+            await asyncio.sleep(self.poll_interval)
+            task_ids = list(self._subscribers)
+            progress = await asyncio.to_thread(self._read_progress, task_ids)
+            for task_id, current in progress.items():
+                if current != self._last_seen.get(task_id):
+                    self._last_seen[task_id] = current
+                    self._wake(task_id)
+
+    def _read_progress(self, task_ids: list) -> dict:
+        store = self.store_factory()
+        return {task_id: store.get_progress(task_id) for task_id in task_ids}
@@ -0,0 +1,501 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# Task record as returned by TaskStore.get():
+# { "status": "pending"|"processing"|"completed"|"failed"|"cancelled", "logs": [], "artifacts": {},
+#   "api_preview": [], "cache_source": task_id or None }
+
+class TaskStore:
+    """
+    Storage for task state. Every mutation touches a single task (and for logs a
+    single line), so backends can persist it without rewriting unrelated tasks.
+    """
+
+    def create(self, task_id: str, status: str, logs: list = None, artifacts: dict = None,
+               api_preview: list = None, cache_source: str = None):
+        raise NotImplementedError
+
+    def exists(self, task_id: str) -> bool:
+        raise NotImplementedError
+
+    def get(self, task_id: str):
+        """Full task record, or None if the task does not exist."""
+        raise NotImplementedError
+
+    def get_status(self, task_id: str):
+        raise NotImplementedError
+
+    def set_status(self, task_id: str, status: str):
+        raise NotImplementedError
+
+    def set_stage(self, task_id: str, stage: str):
+        """Current processing step (e.g. "parsing"), shown next to the status."""
+        raise NotImplementedError
+
+    def append_log(self, task_id: str, line: str):
+        raise NotImplementedError
+
+    def get_logs(self, task_id: str, since: int = 0) -> list:
+        """Log lines from index `since` on."""
+        raise NotImplementedError
+
+    def get_progress(self, task_id: str):
+        """
+        Cheap summary for status polling, or None if the task does not exist:
+        { "status", "stage", "log_count", "artifacts": [kinds], "has_preview" }
+        """
+        raise NotImplementedError
+
+    def set_artifact(self, task_id: str, kind: str, path: str):
+        raise NotImplementedError
+
+    def get_artifacts(self, task_id: str) -> dict:
+        raise NotImplementedError
+
+    def clear_artifacts(self, task_id: str):
+        raise NotImplementedError
+
+    def set_preview(self, task_id: str, apis: list):
+        raise NotImplementedError
+
+    def get_preview(self, task_id: str) -> list:
+        """A cache hit shows the preview of its cache_source task ([] once that task is gone)."""
+        raise NotImplementedError
+
+    def get_cache_source(self, task_id: str):
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def list_tasks(self) -> list:
+        """[{task_id, status, cache_source, created_at, last_accessed_at}] for every task."""
+        raise NotImplementedError
+
+    def touch(self, task_id: str):
+        """Records an artifact download (retention evicts least recently downloaded tasks first)."""
+        raise NotImplementedError
+
+    def request_cancel(self, task_id: str):
+        """Flags the task for cancellation; its job stops at the next stage or row boundary."""
+        raise NotImplementedError
+
+    def is_cancel_requested(self, task_id: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, task_id: str):
+        raise NotImplementedError
+
+    _listeners = ()
+
+    def add_listener(self, callback):
+        """callback(task_id) runs after every change to a task, on the thread that made it."""
+        self._listeners = (*self._listeners, callback)
+
+    def _changed(self, task_id: str):
+        for callback in self._listeners:
+            callback(task_id)
+
+class JsonTaskStore(TaskStore):
+    """
+    The original store: all tasks in one dict, rewritten to a JSON file on every change.
+    Kept for single-process setups that want a human-readable tasks.json; each process
+    holds its own copy, so it cannot be used with several server workers.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._tasks = {}
+        start = time.perf_counter()
+        if self.path.exists():
+            try:
+                with open(self.path, "r") as f:
+                    self._tasks = json.load(f)
+            except Exception:
+                self._tasks = {}
+        print(f"Loaded {len(self._tasks)} tasks from {self.path} in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def _save(self):
+        try:
+            with open(self.path, "w") as f:
+                json.dump(self._tasks, f, indent=4)
+        except Exception as e:
+            print(f"Failed to save tasks: {e}")
+
+    def create(self, task_id, status, logs=None, artifacts=None, api_preview=None, cache_source=None):
+        with self._lock:
+            now = time.time()
+            task = {"status": status, "logs": list(logs or []), "artifacts": dict(artifacts or {}),
+                    "created_at": now, "last_accessed_at": now}
+            if api_preview is not None:
+                task["api_preview"] = api_preview
+            if cache_source:
+                task["cache_source"] = cache_source
+            self._tasks[task_id] = task
+            self._save()
+        self._changed(task_id)
+
+    def exists(self, task_id):
+        return task_id in self._tasks
+
+    def get(self, task_id):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            return {
+                "status": task["status"],
+                "logs": list(task["logs"]),
+                "artifacts": dict(task.get("artifacts", {})),
+                "api_preview": self._preview(task),
+                "cache_source": task.get("cache_source")
+            }
+
+    def get_status(self, task_id):
+        task = self._tasks.get(task_id)
+        return task["status"] if task else None
+
+    def set_status(self, task_id, status):
+        with self._lock:
+            self._tasks[task_id]["status"] = status
+            self._save()
+        self._changed(task_id)
+
+    def set_stage(self, task_id, stage):
+        with self._lock:
+            self._tasks[task_id]["stage"] = stage
+            self._save()
+        self._changed(task_id)
+
+    def append_log(self, task_id, line):
+        with self._lock:
+            self._tasks[task_id]["logs"].append(line)
+            self._save()
+        self._changed(task_id)
+
+    def get_logs(self, task_id, since=0):
+        with self._lock:
+            return self._tasks[task_id]["logs"][since:]
+
+    def get_progress(self, task_id):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            return {
+                "status": task["status"],
+                "stage": task.get("stage"),
+                "log_count": len(task["logs"]),
+                "artifacts": sorted(task.get("artifacts", {})),
+                "has_preview": bool(self._preview(task))
+            }
+
+    def set_artifact(self, task_id, kind, path):
+        with self._lock:
+            self._tasks[task_id].setdefault("artifacts", {})[kind] = path
+            self._save()
+        self._changed(task_id)
+
+    def get_artifacts(self, task_id):
+        with self._lock:
+            return dict(self._tasks[task_id].get("artifacts", {}))
+
+    def clear_artifacts(self, task_id):
+        with self._lock:
+            self._tasks[task_id]["artifacts"] = {}
+            self._save()
+        self._changed(task_id)
+
+    def set_preview(self, task_id, apis):
+        with self._lock:
+            self._tasks[task_id]["api_preview"] = apis
+            self._save()
+        self._changed(task_id)
+
+    def get_preview(self, task_id):
+        return self._preview(self._tasks[task_id])
+
+    def _preview(self, task):
+        if task.get("cache_source"):
+            task = self._tasks.get(task["cache_source"], {})
+        return task.get("api_preview", [])
+
+    def get_cache_source(self, task_id):
+        task = self._tasks.get(task_id)
+        return task.get("cache_source") if task else None
+
+    def count(self):
+        return len(self._tasks)
+
+    def list_tasks(self):
+        with self._lock:
+            result = []
+            for task_id, task in self._tasks.items():
+                # Tasks saved before timestamps were recorded count as created when the store loaded
+                created = task.setdefault("created_at", time.time())
+                result.append({
+                    "task_id": task_id,
+                    "status": task["status"],
+                    "cache_source": task.get("cache_source"),
+                    "created_at": created,
+                    "last_accessed_at": task.get("last_accessed_at", created)
+                })
+            return result
+
+    def touch(self, task_id):
+        with self._lock:
+            if task_id in self._tasks:
+                self._tasks[task_id]["last_accessed_at"] = time.time()
+                self._save()
+
+    def request_cancel(self, task_id):
+        with self._lock:
+            if task_id in self._tasks:
+                self._tasks[task_id]["cancel_requested"] = True
+                self._save()
+
+    def is_cancel_requested(self, task_id):
+        task = self._tasks.get(task_id)
+        return bool(task and task.get("cancel_requested"))
+
+    def delete(self, task_id):
+        with self._lock:
+            if self._tasks.pop(task_id, None) is None:
+                return
+            self._save()
+        self._changed(task_id)
+
+class SqliteTaskStore(TaskStore):
+    """
+    Task state in SQLite (WAL mode). Tasks, log lines, artifacts and previews are
+    separate tables, so each update is a single-row write and lookups go through
+    the primary keys. WAL lets readers run while a writer is active, including
+    readers in other processes, so all server workers can share one database.
+
+    On first use, tasks from a legacy tasks.json (`import_path`) are copied in.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            task_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            stage TEXT,
+            cache_source TEXT,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            last_accessed_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS task_logs (
+            task_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            line TEXT NOT NULL,
+            PRIMARY KEY (task_id, seq)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS task_artifacts (
+            task_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            path TEXT NOT NULL,
+            PRIMARY KEY (task_id, kind)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS task_previews (
+            task_id TEXT PRIMARY KEY,
+            apis TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path: Path, import_path: Path = None):
+        self.path = Path(path)
+        self._local = threading.local()
+        start = time.perf_counter()
+        conn = self._conn()
+        with conn:
+            conn.executescript(self.SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+            if "last_accessed_at" not in columns:
+                conn.execute("ALTER TABLE tasks ADD COLUMN last_accessed_at REAL NOT NULL DEFAULT 0")
+                conn.execute("UPDATE tasks SET last_accessed_at = created_at")
+            if "stage" not in columns:
+                conn.execute("ALTER TABLE tasks ADD COLUMN stage TEXT")
+            if "cancel_requested" not in columns:
+                conn.execute("ALTER TABLE tasks ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0")
+        if import_path is not None and self.count() == 0 and Path(import_path).exists():
+            self._import_json(Path(import_path))
+        print(f"Opened task store {self.path} ({self.count()} tasks) in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections must not be shared across threads,
+        # nor carried into a forked job worker process
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _import_json(self, import_path: Path):
+        try:
+            with open(import_path, "r") as f:
+                legacy = json.load(f)
+        except Exception as e:
+            print(f"Could not import tasks from {import_path}: {e}")
+            return
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for task_id, task in legacy.items():
+                conn.execute("INSERT OR IGNORE INTO tasks (task_id, status, cache_source, created_at, updated_at, "
+                             "last_accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                             (task_id, task.get("status", "failed"), task.get("cache_source"), now, now, now))
+                conn.executemany("INSERT OR IGNORE INTO task_logs VALUES (?, ?, ?)",
+                                 [(task_id, i, line) for i, line in enumerate(task.get("logs", []))])
+                conn.executemany("INSERT OR IGNORE INTO task_artifacts VALUES (?, ?, ?)",
+                                 [(task_id, kind, path) for kind, path in task.get("artifacts", {}).items()])
+                if task.get("api_preview"):
+                    conn.execute("INSERT OR IGNORE INTO task_previews VALUES (?, ?)",
+                                 (task_id, json.dumps(task["api_preview"])))
+        print(f"Imported {len(legacy)} tasks from {import_path}")
+
+    def create(self, task_id, status, logs=None, artifacts=None, api_preview=None, cache_source=None):
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT INTO tasks (task_id, status, cache_source, created_at, updated_at, last_accessed_at) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", (task_id, status, cache_source, now, now, now))
+            conn.executemany("INSERT INTO task_logs VALUES (?, ?, ?)",
+                             [(task_id, i, line) for i, line in enumerate(logs or [])])
+            conn.executemany("INSERT INTO task_artifacts VALUES (?, ?, ?)",
+                             [(task_id, kind, path) for kind, path in (artifacts or {}).items()])
+            if api_preview is not None:
+                conn.execute("INSERT INTO task_previews VALUES (?, ?)", (task_id, json.dumps(api_preview)))
+        self._changed(task_id)
+
+    def exists(self, task_id):
+        return self._conn().execute("SELECT 1 FROM tasks WHERE task_id = ?", (task_id,)).fetchone() is not None
+
+    def get(self, task_id):
+        row = self._conn().execute("SELECT status, cache_source FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "status": row[0],
+            "logs": self.get_logs(task_id),
+            "artifacts": self.get_artifacts(task_id),
+            "api_preview": self.get_preview(task_id),
+            "cache_source": row[1]
+        }
+
+    def get_status(self, task_id):
+        row = self._conn().execute("SELECT status FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return row[0] if row else None
+
+    def set_status(self, task_id, status):
+        self._conn().execute("UPDATE tasks SET status = ?, updated_at = ? WHERE task_id = ?",
+                             (status, time.time(), task_id))
+        self._changed(task_id)
+
+    def set_stage(self, task_id, stage):
+        self._conn().execute("UPDATE tasks SET stage = ?, updated_at = ? WHERE task_id = ?",
+                             (stage, time.time(), task_id))
+        self._changed(task_id)
+
+    def append_log(self, task_id, line):
+        # seq is assigned inside the INSERT, which runs under SQLite's write lock
+        self._conn().execute(
+            "INSERT INTO task_logs (task_id, seq, line) "
+            "SELECT ?, COALESCE(MAX(seq) + 1, 0), ? FROM task_logs WHERE task_id = ?",
+            (task_id, line, task_id))
+        self._changed(task_id)
+
+    def get_logs(self, task_id, since=0):
+        rows = self._conn().execute("SELECT line FROM task_logs WHERE task_id = ? AND seq >= ? ORDER BY seq",
+                                    (task_id, since))
+        return [r[0] for r in rows]
+
+    def get_progress(self, task_id):
+        conn = self._conn()
+        # One read transaction so the parts are consistent with each other
+        with conn:
+            conn.execute("BEGIN")
+            row = conn.execute(
+                "SELECT status, stage, (SELECT COUNT(*) FROM task_logs WHERE task_id = ?), "
+                "EXISTS (SELECT 1 FROM task_previews WHERE task_id = COALESCE(tasks.cache_source, tasks.task_id)) "
+                "FROM tasks WHERE task_id = ?",
+                (task_id, task_id)).fetchone()
+            if row is None:
+                return None
+            kinds = [r[0] for r in conn.execute(
+                "SELECT kind FROM task_artifacts WHERE task_id = ? ORDER BY kind", (task_id,))]
+        return {"status": row[0], "stage": row[1], "log_count": row[2], "artifacts": kinds, "has_preview": bool(row[3])}
+
+    def set_artifact(self, task_id, kind, path):
+        self._conn().execute("INSERT OR REPLACE INTO task_artifacts VALUES (?, ?, ?)", (task_id, kind, path))
+        self._changed(task_id)
+
+    def get_artifacts(self, task_id):
+        rows = self._conn().execute("SELECT kind, path FROM task_artifacts WHERE task_id = ?", (task_id,))
+        return {kind: path for kind, path in rows}
+
+    def clear_artifacts(self, task_id):
+        self._conn().execute("DELETE FROM task_artifacts WHERE task_id = ?", (task_id,))
+        self._changed(task_id)
+
+    def set_preview(self, task_id, apis):
+        self._conn().execute("INSERT OR REPLACE INTO task_previews VALUES (?, ?)", (task_id, json.dumps(apis)))
+        self._changed(task_id)
+
+    def get_preview(self, task_id):
+        row = self._conn().execute(
+            "SELECT p.apis FROM tasks t JOIN task_previews p ON p.task_id = COALESCE(t.cache_source, t.task_id) "
+            "WHERE t.task_id = ?", (task_id,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def get_cache_source(self, task_id):
+        row = self._conn().execute("SELECT cache_source FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return row[0] if row else None
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def list_tasks(self):
+        rows = self._conn().execute(
+            "SELECT task_id, status, cache_source, created_at, last_accessed_at FROM tasks")
+        return [{"task_id": r[0], "status": r[1], "cache_source": r[2], "created_at": r[3], "last_accessed_at": r[4]}
+                for r in rows]
+
+    def touch(self, task_id):
+        self._conn().execute("UPDATE tasks SET last_accessed_at = ? WHERE task_id = ?", (time.time(), task_id))
+
+    def request_cancel(self, task_id):
+        self._conn().execute("UPDATE tasks SET cancel_requested = 1, updated_at = ? WHERE task_id = ?",
+                             (time.time(), task_id))
+
+    def is_cancel_requested(self, task_id):
+        row = self._conn().execute("SELECT cancel_requested FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return bool(row and row[0])
+
+    def delete(self, task_id):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for table in ("task_logs", "task_artifacts", "task_previews", "tasks"):
+                conn.execute(f"DELETE FROM {table} WHERE task_id = ?", (task_id,))
+        self._changed(task_id)
+
+def open_task_store(kind: str, directory: Path) -> TaskStore:
+    """Store selected by TASK_STORE: "sqlite" (default, tasks.db) or "json" (legacy tasks.json)."""
+    directory = Path(directory)
+    if kind == "json":
+        return JsonTaskStore(directory / "tasks.json")
+    if kind == "sqlite":
+        return SqliteTaskStore(directory / "tasks.db", import_path=directory / "tasks.json")
+    raise ValueError(f"Unknown task store '{kind}'. Use 'sqlite' or 'json'.")
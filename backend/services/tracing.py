@@ -0,0 +1,215 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import NamedTuple
+
+class JsonlExporter:
+    """
+    Writes finished spans as JSON lines to `<directory>/<trace_id>.jsonl`, one file
+    per trace. Each span is a single append, so any process (server and job workers,
+    parser pool, forked children) can export to the same trace.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def path(self, trace_id: str) -> Path:
+        return self.directory / f"{trace_id}.jsonl"
+
+    def export(self, record: dict):
+        line = (json.dumps(record, default=str) + "\n").encode("utf-8")
+        try:
+            fd = os.open(self.path(record["trace_id"]), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        except FileNotFoundError:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.path(record["trace_id"]), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def read(self, trace_id: str) -> list:
+        """The spans of a trace (an empty list if it has none), skipping any torn line."""
+        spans = []
+        try:
+            with open(self.path(trace_id), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        spans.append(json.loads(line))
+                    except ValueError:
+                        pass
+        except FileNotFoundError:
+            pass
+        return spans
+
+class SpanContext(NamedTuple):
+    """What a span's children need: picklable, so it can be passed to another process."""
+    trace_id: str
+    span_id: str
+    exporter: JsonlExporter
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+def new_trace(trace_id: str, exporter: JsonlExporter):
+    """Parent for the first span of a trace; None (no tracing) without an exporter."""
+    if exporter is None:
+        return None
+    return SpanContext(trace_id, None, exporter)
+
+def current_context():
+    """The context of the current span, to parent spans in another thread or process; None if not tracing."""
+    span = _current.get()
+    return span.context if span is not None else None
+
+def new_span_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+def reserve_context():
+    """
+    Context of a span of the current trace that has not started yet: start it later
+    with start_span(..., span_id=context.span_id). Work handed off before the span
+    starts (e.g. to a process forked earlier) can already be parented to it. None if
+    not tracing.
+    """
+    parent = current_context()
+    if parent is None:
+        return None
+    return SpanContext(parent.trace_id, new_span_id(), parent.exporter)
+
+def set_attributes(**attributes):
+    """Adds attributes to the current span, if any."""
+    span = _current.get()
+    if span is not None:
+        span.set(**attributes)
+
+class Span:
+    def __init__(self, name: str, parent: SpanContext, attributes: dict, span_id: str = None):
+        self.name = name
+        self.context = SpanContext(parent.trace_id, span_id or new_span_id(), parent.exporter)
+        self.parent_id = parent.span_id
+        self.attributes = dict(attributes)
+        self.error = None
+        self._start = time.time()
+        self._perf_start = time.perf_counter()
+        self._token = _current.set(self)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error: BaseException):
+        """Marks the span as failed, for errors that are handled inside it."""
+        self.error = error
+
+    def end(self, error: BaseException = None):
+        """Exports the span and makes its parent current again. Call on the thread that started it."""
+        duration = time.perf_counter() - self._perf_start
+        _current.reset(self._token)
+        error = error or self.error
+        record = {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self._start,
+            "duration_ms": round(duration * 1000, 3),
+            "status": "ok" if error is None else "error",
+            "error": None if error is None else f"{type(error).__name__}: {error}",
+            "attributes": self.attributes,
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name
+        }
+        try:
+            self.context.exporter.export(record)
+        except OSError as e:
+            # Tracing must not fail the work it observes
+            print(f"Failed to export span {self.name}: {e}")
+
+class _NoSpan:
+    """Stands in for a span when nothing is being traced."""
+    context = None
+
+    def set(self, **attributes):
+        pass
+
+    def fail(self, error: BaseException):
+        pass
+
+    def end(self, error: BaseException = None):
+        pass
+
+_NO_SPAN = _NoSpan()
+
+def start_span(name: str, parent: SpanContext = None, span_id: str = None, **attributes):
+    """
+    Starts a span below `parent` (by default the current span) and makes it current;
+    end() it in a finally. Without a parent or current span nothing is recorded.
+    span_id is that of a reserve_context(), by default a new one.
+    """
+    parent = parent if parent is not None else current_context()
+    if parent is None:
+        return _NO_SPAN
+    return Span(name, parent, attributes, span_id)
+
+@contextmanager
+def span(name: str, parent: SpanContext = None, span_id: str = None, **attributes):
+    """Records the block as a span (see start_span()); an exception marks it as failed."""
+    current = start_span(name, parent, span_id, **attributes)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(e)
+        raise
+    current.end()
+
+def traced(name: str):
+    """Decorator recording each call of the function as a span `name`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def waterfall(spans: list) -> dict:
+    """
+    Orders a trace's spans depth first by start time and adds `depth` and
+    `offset_ms` (from the start of the trace). Spans whose parent is missing (e.g.
+    still running) are shown at the top level.
+    """
+    if not spans:
+        return {"total_ms": 0.0, "spans": []}
+    trace_start = min(s["start"] for s in spans)
+    trace_end = max(s["start"] + s["duration_ms"] / 1000 for s in spans)
+    ids = {s["span_id"] for s in spans}
+    children = {}
+    for s in sorted(spans, key=lambda s: s["start"]):
+        parent = s["parent_id"] if s["parent_id"] in ids else None
+        children.setdefault(parent, []).append(s)
+
+    ordered = []
+    pending = [(s, 0) for s in reversed(children.get(None, []))]
+    while pending:
+        s, depth = pending.pop()
+        ordered.append(dict(s, depth=depth, offset_ms=round((s["start"] - trace_start) * 1000, 3)))
+        pending.extend((child, depth + 1) for child in reversed(children.get(s["span_id"], [])))
+    return {"total_ms": round((trace_end - trace_start) * 1000, 3), "spans": ordered}
+
+def render_waterfall(view: dict, width: int = 60) -> str:
+    """waterfall() as text: one line per span, with a bar placed on the trace's timeline."""
+    total = view["total_ms"] or 1.0
+    lines = []
+    for s in view["spans"]:
+        begin = int(s["offset_ms"] / total * width)
+        length = max(1, round(s["duration_ms"] / total * width))
+        bar = (" " * begin + "#" * length)[:width].ljust(width)
+        label = ("  " * s["depth"] + s["name"])[:40]
+        marker = " !" if s["status"] == "error" else ""
+        lines.append(f"{label:<40} |{bar}| {s['offset_ms']:>10.1f} ms +{s['duration_ms']:>10.1f} ms{marker}")
+    return "\n".join(lines) + "\n"
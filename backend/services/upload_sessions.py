@@ -0,0 +1,106 @@
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None # Windows: concurrent writes to one upload are not prevented
+
+class UploadBusy(Exception):
+    """Raised by UploadSessions.lock() while another request is writing to the upload."""
+
+class UploadSessions:
+    """
+    Resumable uploads received in chunks. `<directory>/<upload_id>.part` holds the bytes
+    and `<directory>/<upload_id>.json` the session: file name, expected size and optional
+    SHA-256, upload options, and `received`, the number of bytes verified so far. Bytes
+    past `received` (e.g. of a chunk that failed its checksum) do not count and are
+    overwritten by the next chunk.
+
+    Both files live in the uploads directory, so any server worker can take the next
+    chunk, and sessions abandoned for longer than the retention sweep's upload grace
+    period are removed with other stale uploads.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def part_path(self, upload_id: str) -> Path:
+        return self.directory / f"{upload_id}.part"
+
+    def _meta_path(self, upload_id: str) -> Path:
+        return self.directory / f"{upload_id}.json"
+
+    def create(self, filename: str, size: int, sha256: str = None, options: dict = None) -> dict:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        session = {
+            "upload_id": str(uuid.uuid4()),
+            "filename": filename,
+            "size": size,
+            "sha256": sha256.lower() if sha256 else None,
+            "options": options or {},
+            "received": 0,
+            "created_at": time.time()
+        }
+        self.part_path(session["upload_id"]).touch()
+        self._save(session)
+        return session
+
+    def get(self, upload_id: str):
+        """The session, or None if it is unknown, finished or expired."""
+        try:
+            uuid.UUID(upload_id) # also keeps the id from naming a path outside the directory
+            with open(self._meta_path(upload_id), "r") as f:
+                return json.load(f)
+        except (ValueError, OSError):
+            return None
+
+    def set_received(self, session: dict, received: int):
+        session["received"] = received
+        self._save(session)
+
+    def _save(self, session: dict):
+        path = self._meta_path(session["upload_id"])
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(session, f)
+        os.replace(tmp, path)
+
+    @contextmanager
+    def lock(self, upload_id: str):
+        """
+        Exclusive access to an upload's bytes, across server workers. Raises UploadBusy
+        if another request holds it, FileNotFoundError if the upload is gone.
+        """
+        with open(self.part_path(upload_id), "rb") as part:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    raise UploadBusy()
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(part, fcntl.LOCK_UN)
+
+    def finish(self, upload_id: str, dest: Path):
+        """Ends the session, moving its bytes to `dest`."""
+        os.remove(self._meta_path(upload_id))
+        os.replace(self.part_path(upload_id), dest)
+
+    def reopen(self, session: dict, path: Path):
+        """Undoes finish(), e.g. when the task could not be queued."""
+        os.replace(path, self.part_path(session["upload_id"]))
+        self._save(session)
+
+    def delete(self, upload_id: str):
+        for path in (self._meta_path(upload_id), self.part_path(upload_id)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
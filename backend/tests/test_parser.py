@@ -0,0 +1,18 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.parser import parse_file
+
+HEADER = "API Name,HTTP Method,Endpoint URL\n"
+
+def test_csv_blank_line_between_rows_is_skipped():
+    content = (HEADER + "List users,GET,/users\n\nCreate user,POST,/users\n").encode("utf-8")
+    api_data, warnings = parse_file(content, "apis.csv")
+    assert [(api["name"], api["method"]) for api in api_data["apis"]] == [("List users", "GET"), ("Create user", "POST")]
+
+def test_tsv_blank_line_between_rows_is_skipped():
+    content = (HEADER.replace(",", "\t") + "List users\tGET\t/users\n\t\t\nCreate user\tPOST\t/users\n").encode("utf-8")
+    api_data, warnings = parse_file(content, "apis.tsv")
+    assert [api["name"] for api in api_data["apis"]] == ["List users", "Create user"]
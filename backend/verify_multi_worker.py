@@ -0,0 +1,142 @@
+"""
+Multi-worker check: several server processes sharing one artifacts_storage must all
+see the same tasks.
+
+Starts WORKERS independent uvicorn processes (each on its own port, so every request
+lands on a known process; `uvicorn --workers N` runs the same kind of processes
+behind one shared socket) in a scratch directory, uploads a synthetic catalogue
+to the first one, then polls the task status from every worker and downloads the artifacts
+from the last one.
+
+Usage (from the backend directory):
+    python verify_multi_worker.py [WORKERS]
+"""
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BACKEND_DIR)
+
+from benchmark_parser import write_catalogue
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_worker(port, workdir):
+    env = dict(os.environ, TASK_STORE="sqlite", PARSER_WORKERS="1")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND_DIR,
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def get(port, path):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=30) as response:
+        return response.getcode(), response.read()
+
+def wait_ready(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            get(port, "/api/cache/stats")
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError(f"Worker on port {port} did not start")
+
+def upload(port, file_path):
+    boundary = "----MultiWorkerBoundary"
+    with open(file_path, "rb") as f:
+        content = f.read()
+    body = (f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{os.path.basename(file_path)}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n").encode("utf-8") + content + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    req = urllib.request.Request(f"http://127.0.0.1:{port}/api/upload", data=body)
+    req.add_header("Content-Type", f"multipart/form-data; boundary={boundary}")
+    with urllib.request.urlopen(req, timeout=60) as response:
+        return json.loads(response.read())
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    workdir = tempfile.mkdtemp(prefix="multi_worker_")
+    ports = [free_port() for _ in range(workers)]
+    procs = [start_worker(port, workdir) for port in ports]
+    failures = []
+    try:
+        for port in ports:
+            wait_ready(port)
+        print(f"Started {workers} workers on ports {ports} in {workdir}")
+
+        sample = os.path.join(workdir, "multi_worker.xlsx")
+        write_catalogue(sample, ".xlsx", rows=200, payload_bytes=200, header_variant="canonical", env_rows=5)
+        task_id = upload(ports[0], sample)["task_id"]
+        print(f"Uploaded {os.path.basename(sample)} to worker 0 -> task {task_id}")
+
+        # Poll round-robin across workers until the task finishes
+        status = None
+        deadline = time.time() + 120
+        i = 0
+        while time.time() < deadline:
+            port = ports[i % workers]
+            try:
+                code, body = get(port, f"/api/status/{task_id}")
+                status = json.loads(body)["status"]
+            except urllib.error.HTTPError as e:
+                failures.append(f"worker {i % workers}: status returned HTTP {e.code}")
+                break
+            if status in ("completed", "failed"):
+                break
+            i += 1
+            time.sleep(0.2)
+        print(f"Final status after {i + 1} polls: {status}")
+        if status != "completed":
+            failures.append(f"task ended as {status}")
+
+        for n, port in enumerate(ports):
+            try:
+                code, body = get(port, f"/api/status/{task_id}")
+                seen = json.loads(body)
+                print(f"worker {n}: HTTP {code}, status={seen['status']}, logs={len(seen['logs'])}, artifacts={seen['artifacts_ready']}")
+                if seen["status"] != status:
+                    failures.append(f"worker {n} sees status {seen['status']}")
+            except urllib.error.HTTPError as e:
+                failures.append(f"worker {n}: status returned HTTP {e.code}")
+
+        for file_type in ("postman", "pytest"):
+            try:
+                code, body = get(ports[-1], f"/api/download/{task_id}/{file_type}")
+                print(f"worker {workers - 1}: downloaded {file_type} ({len(body)} bytes)")
+            except urllib.error.HTTPError as e:
+                failures.append(f"worker {workers - 1}: {file_type} download returned HTTP {e.code}")
+
+        # A second upload of the same file on another worker must hit the shared artifact cache
+        if workers > 1:
+            cached = upload(ports[1], sample)
+            print(f"Re-upload to worker 1: cached={cached.get('cached', False)}")
+            if not cached.get("cached"):
+                failures.append("re-upload on another worker missed the artifact cache")
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if failures:
+        print("FAILURE:")
+        for f in failures:
+            print(f"  - {f}")
+        sys.exit(1)
+    print("SUCCESS: every worker sees the same task state and artifacts.")
+
+if __name__ == "__main__":
+    main()
@@ -56,7 +56,7 @@ for i in range(10):
     
     if status['status'] == 'completed':
         print("\n--- API Preview Data ---")
-        preview = status.get('api_preview', [])
+        preview = requests.get(f"http://localhost:8000/api/tasks/{task_id}/preview").json()["apis"]
         print(json.dumps(preview, indent=2))
         
         # Verify fields
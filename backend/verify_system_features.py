@@ -2,6 +2,9 @@ import sys
 import os
 import json
 import io
+import shutil
+import tempfile
+import zipfile
 from unittest.mock import MagicMock
 
 # Add backend to path
@@ -150,25 +153,18 @@ def test_feature_3_pytest_generation():
         ]
     }
     
-    # Intercept file creation to check content
+    # Generate into a scratch directory and read the files back from the zip
     generated_files = {}
-    def mock_create_file(path, content):
-        generated_files[str(path)] = content
-        
-    # Monkeypatch
-    import services.pytest_generator as pg
-    original_create = pg._create_file
-    pg._create_file = mock_create_file
-    
-    # Try generating (we verify we don't crash and check content)
-    output_dir = "mock_dir"
+    output_dir = tempfile.mkdtemp(prefix="mock_dir_")
     try:
-        pg.generate_pytest_project(api_data, output_dir)
+        zip_path = generate_pytest_project(api_data, output_dir)
+        with zipfile.ZipFile(zip_path) as zf:
+            generated_files = {name: zf.read(name).decode("utf-8") for name in zf.namelist()}
     except Exception as e:
         print(f"FAILED: Pytest generation crashed: {e}")
         return False
     finally:
-        pg._create_file = original_create # Restore
+        shutil.rmtree(output_dir, ignore_errors=True)
         
     # Check Conftest for Base URL
     conftest = None
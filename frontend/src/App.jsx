@@ -3,6 +3,60 @@ import axios from 'axios';
 import { Upload, FileText, Code, CheckCircle, AlertCircle, Loader2, Download, HelpCircle, X, Sparkles, Zap, LayoutTemplate } from 'lucide-react';
 import { API_BASE_URL } from './config';
 
+// Files this large go through the resumable chunked upload API instead of one request
+const CHUNKED_UPLOAD_THRESHOLD = 32 * 1024 * 1024;
+const MAX_CHUNK_RETRIES = 5;
+
+const sha256Hex = async (buffer) => {
+    const digest = await crypto.subtle.digest('SHA-256', buffer);
+    return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, '0')).join('');
+};
+
+// Sends the file in chunks, resuming from the server's offset after a failed chunk.
+// Resolves with the finalize response ({ task_id, ... }).
+const uploadInChunks = async (file, fields, onProgress) => {
+    const form = new FormData();
+    form.append('filename', file.name);
+    form.append('size', file.size);
+    Object.entries(fields).forEach(([key, value]) => form.append(key, value));
+    const { data: session } = await axios.post(`${API_BASE_URL}/api/uploads`, form);
+    const url = `${API_BASE_URL}/api/uploads/${session.upload_id}`;
+
+    let offset = 0;
+    let failures = 0;
+    while (offset < file.size) {
+        const chunk = await file.slice(offset, offset + session.chunk_size).arrayBuffer();
+        try {
+            const { data } = await axios.put(url, chunk, {
+                params: { offset },
+                headers: { 'Content-Type': 'application/octet-stream', 'X-Chunk-SHA256': await sha256Hex(chunk) }
+            });
+            offset = data.received;
+            failures = 0;
+            onProgress(offset, file.size);
+        } catch (err) {
+            if (++failures > MAX_CHUNK_RETRIES) throw err;
+            await new Promise((resolve) => setTimeout(resolve, 1000 * failures));
+            try {
+                offset = (await axios.get(url)).data.received;
+            } catch {
+                // Still unreachable; retry the same chunk
+            }
+        }
+    }
+    // A full job queue (429) keeps the upload; finalize again once there is room
+    for (let attempt = 1; ; attempt++) {
+        try {
+            const { data } = await axios.post(`${url}/finalize`);
+            return data;
+        } catch (err) {
+            if (err.response?.status !== 429 || attempt > MAX_CHUNK_RETRIES) throw err;
+            const wait = Number(err.response.headers['retry-after']) || attempt;
+            await new Promise((resolve) => setTimeout(resolve, 1000 * wait));
+        }
+    }
+};
+
 function App() {
     const [file, setFile] = useState(null);
     const [taskId, setTaskId] = useState(null);
@@ -25,10 +79,20 @@ function App() {
         setLogs(['Starting upload...']);
         setError(null);
 
-        const formData = new FormData();
-        formData.append('file', file);
+        // Interactive uploads go ahead of bulk (e.g. CI) submissions in the job queue
+        const fields = { priority: 'high' };
 
         try {
+            if (file.size >= CHUNKED_UPLOAD_THRESHOLD) {
+                const result = await uploadInChunks(file, fields, (sent, total) => {
+                    setLogs(['Starting upload...', `Uploaded ${Math.floor((sent / total) * 100)}% of ${(total / 1048576).toFixed(1)} MB`]);
+                });
+                setTaskId(result.task_id);
+                return;
+            }
+            const formData = new FormData();
+            formData.append('file', file);
+            Object.entries(fields).forEach(([key, value]) => formData.append(key, value));
             const response = await axios.post(`${API_BASE_URL}/api/upload`, formData, {
                 headers: { 'Content-Type': 'multipart/form-data' }
             });
@@ -40,33 +104,59 @@ function App() {
     };
 
     useEffect(() => {
-        let interval;
-        if (taskId && stage === 'processing') {
-            interval = setInterval(async () => {
-                try {
-                    const res = await axios.get(`${API_BASE_URL}/api/status/${taskId}`);
-                    setLogs(res.data.logs);
-
-                    if (res.data.status === 'completed') {
-                        setStage('completed');
-                        setArtifacts({
-                            files: res.data.artifacts_ready,
-                            preview: res.data.api_preview
-                        });
-                        clearInterval(interval);
-                    } else if (res.data.status === 'failed') {
-                        setStage('upload'); // OR completed with error
-                        setError("Processing failed. Check logs.");
-                        clearInterval(interval);
+        if (!taskId || stage !== 'processing') return;
+
+        // The server pushes new log lines, stage and status changes; EventSource reconnects
+        // on its own and resumes from the last log line via Last-Event-ID.
+        const events = new EventSource(`${API_BASE_URL}/api/tasks/${taskId}/events`);
+
+        events.addEventListener('logs', (e) => {
+            const { offset, lines } = JSON.parse(e.data);
+            setLogs((prev) => [...prev.slice(0, offset), ...lines]);
+        });
+
+        events.addEventListener('complete', async (e) => {
+            events.close();
+            const data = JSON.parse(e.data);
+            if (data.status === 'completed') {
+                let preview = [];
+                if (data.preview_available) {
+                    try {
+                        const previewRes = await axios.get(`${API_BASE_URL}/api/tasks/${taskId}/preview`);
+                        preview = previewRes.data.apis;
+                    } catch (err) {
+                        console.error("Preview error", err);
                     }
-                } catch (err) {
-                    console.error("Polling error", err);
                 }
-            }, 1000);
-        }
-        return () => clearInterval(interval);
+                setStage('completed');
+                setArtifacts({
+                    files: data.artifacts_ready,
+                    preview: preview
+                });
+            } else if (data.status === 'cancelled') {
+                setStage('upload');
+                setError("Processing cancelled.");
+            } else {
+                setStage('upload'); // OR completed with error
+                setError("Processing failed. Check logs.");
+            }
+        });
+
+        events.onerror = () => console.error("Event stream error, reconnecting...");
+
+        return () => events.close();
     }, [taskId, stage]);
 
+    const cancelTask = async () => {
+        if (!taskId) return;
+        try {
+            // The event stream reports the final "cancelled" status
+            await axios.delete(`${API_BASE_URL}/api/tasks/${taskId}`);
+        } catch (err) {
+            console.error("Cancel error", err);
+        }
+    };
+
     const downloadFile = (type) => {
         window.open(`${API_BASE_URL}/api/download/${taskId}/${type}`, '_blank');
     };
@@ -119,7 +209,7 @@ function App() {
                             <div className="relative bg-white/80 backdrop-blur-sm border-2 border-dashed border-slate-300 hover:border-violet-400 rounded-2xl p-12 transition-all cursor-pointer">
                                 <input
                                     type="file"
-                                    accept=".xlsx"
+                                    accept=".xlsx,.csv,.tsv,.jsonl"
                                     onChange={handleFileChange}
                                     className="absolute inset-0 w-full h-full opacity-0 cursor-pointer z-20"
                                 />
@@ -131,7 +221,7 @@ function App() {
                                         <span className="font-bold text-lg text-slate-700 group-hover:text-violet-700 transition-colors">
                                             {file ? file.name : "Click to Upload Spec"}
                                         </span>
-                                        <span className="text-sm text-slate-400 font-medium">.xlsx format supported</span>
+                                        <span className="text-sm text-slate-400 font-medium">.xlsx, .csv, .tsv and .jsonl supported</span>
                                     </div>
                                 </div>
                             </div>
@@ -186,6 +276,14 @@ function App() {
                             </div>
                         ))}
                     </div>
+
+                    <button
+                        onClick={cancelTask}
+                        disabled={!taskId}
+                        className={`mt-6 text-sm font-semibold text-slate-400 transition-colors ${!taskId ? 'opacity-50 cursor-not-allowed' : 'hover:text-red-600'}`}
+                    >
+                        Cancel
+                    </button>
                 </div>
 
                 {/* Completion Stage - Success Dashboard */}